@@ -0,0 +1,261 @@
+"""Local HTTP/JSON API over the dashboard's query engine
+
+Answers the same filter queries as the Streamlit app from the cached
+classified data, without a browser session. A thread per request; all
+requests share one QueryEngine and its filter cache.
+
+Usage: python api.py [--host 127.0.0.1] [--port 8600] [--csv china_investment_tracker.csv]
+
+Endpoints (GET, filters as query parameters; unset filters take the
+dashboard defaults):
+    /health
+    /industries                     target industries, other sectors, countries, years
+    /overview                       projects, total / average amount, countries; approximate=1
+                                    answers from amount sketches (adds median and p90 amount)
+    /concentration                  HHI, top-3 share, top destination per industry
+    /trends?industry=...            amount and projects per year; granularity=quarter|month
+                                    adds rolling sums (window=N periods, default a year) and YoY %
+    /destinations?industry=...&top=15
+    /projects?page=1&page_size=200  filtered projects, largest amount first
+    /export.csv                     the filtered view, streamed in chunks
+    /metrics                        request timings and cache lookups (Prometheus text)
+
+Filters: industry=... (repeatable), country=... (repeatable), year_min,
+year_max, amount_min, amount_max.
+"""
+import argparse
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from classifier import DATA_FILE
+from engine import DEFAULT_AMOUNT_RANGE, PROJECT_COLUMNS, QueryEngine
+from export import iter_csv
+import instrument
+import warmup
+from rollup import GRANULARITIES
+
+MAX_PAGE_SIZE = 5000
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _json_value(value):
+    """Plain JSON value for NumPy / pandas scalars (NaN, infinities and missing as null)"""
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if value is None or isinstance(value, (str, int, bool)):
+        return value
+    try:
+        if value != value:  # pandas NA / NaT
+            return None
+    except TypeError:
+        return None
+    return str(value)
+
+
+def _plain(payload):
+    """payload with every leaf made a plain JSON value (json.dumps passes float NaN through)"""
+    if isinstance(payload, dict):
+        return {key: _plain(value) for key, value in payload.items()}
+    if isinstance(payload, (list, tuple)):
+        return [_plain(value) for value in payload]
+    return _json_value(payload)
+
+
+def _records(frame):
+    return [{col: _json_value(value) for col, value in zip(frame.columns, row)}
+            for row in frame.itertuples(index=False, name=None)]
+
+
+def _number(params, name, cast=float):
+    values = params.get(name)
+    if not values:
+        return None
+    try:
+        return cast(values[-1])
+    except ValueError:
+        raise BadRequest(f'{name} must be a number') from None
+
+
+def parse_filters(engine, params):
+    """Canonical filter key from query parameters"""
+    industries = params.get('industry')
+    unknown = [i for i in industries or () if i not in engine.index._code]
+    if unknown:
+        raise BadRequest(f'unknown industry: {unknown[0]}')
+
+    year_bounds = engine.year_bounds()
+    year_min, year_max = _number(params, 'year_min', int), _number(params, 'year_max', int)
+    year_range = None
+    if year_min is not None or year_max is not None:
+        year_range = (year_bounds[0] if year_min is None else year_min,
+                      year_bounds[1] if year_max is None else year_max)
+
+    amount_min, amount_max = _number(params, 'amount_min'), _number(params, 'amount_max')
+    amount_range = None
+    if amount_min is not None or amount_max is not None:
+        amount_range = (DEFAULT_AMOUNT_RANGE[0] if amount_min is None else amount_min,
+                        DEFAULT_AMOUNT_RANGE[1] if amount_max is None else amount_max)
+
+    return engine.key(industries, year_range, amount_range, params.get('country'))
+
+
+def _industry(params):
+    industry = (params.get('industry') or [None])[-1]
+    if industry is None:
+        raise BadRequest('industry is required')
+    return industry
+
+
+def handle_overview(engine, params, key):
+    approximate = (params.get('approximate') or ['0'])[-1] not in ('0', 'false', '')
+    return engine.overview(key, approximate=approximate)
+
+
+def handle_concentration(engine, params, key):
+    frame = engine.concentration(key).frame
+    frame = frame.reindex([i for i in key[0] if i in frame.index])
+    return {'industries': _records(frame.reset_index())}
+
+
+def handle_trends(engine, params, key):
+    industry = _industry(params)
+    granularity = (params.get('granularity') or ['year'])[-1]
+    if granularity == 'year':
+        return {'industry': industry, 'years': _records(engine.stats(key).by_year(industry))}
+    if granularity not in GRANULARITIES:
+        raise BadRequest(f'granularity must be one of year, {", ".join(GRANULARITIES)}')
+    window = _number(params, 'window', int)
+    if window is not None and window < 1:
+        raise BadRequest('window must be at least 1')
+    series = engine.periods(key).series(industry, granularity, window)
+    return {'industry': industry, 'granularity': granularity, 'periods': _records(series)}
+
+
+def handle_destinations(engine, params, key):
+    industry = _industry(params)
+    top = _number(params, 'top', int)
+    if top is None:
+        top = 15
+    elif top < 1:
+        raise BadRequest('top must be at least 1')
+    return {'industry': industry, 'countries': _records(engine.stats(key).by_country(industry).head(top))}
+
+
+def handle_projects(engine, params, key):
+    page = max(_number(params, 'page', int) or 1, 1)
+    page_size = min(max(_number(params, 'page_size', int) or 200, 1), MAX_PAGE_SIZE)
+    selection = engine.selection(key)
+    start = (page - 1) * page_size
+    stop = min(start + page_size, len(selection))
+    frame = selection.page(PROJECT_COLUMNS, start, max(start, stop))
+    return {'total': len(selection), 'page': page, 'page_size': page_size, 'projects': _records(frame)}
+
+
+ROUTES = {
+    '/overview': handle_overview,
+    '/concentration': handle_concentration,
+    '/trends': handle_trends,
+    '/destinations': handle_destinations,
+    '/projects': handle_projects,
+}
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    engine = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            return self._send_text(instrument.REGISTRY.render())
+        # Unknown paths share one label, so clients can't grow the metrics without bound
+        known = url.path in ROUTES or url.path in ('/health', '/industries', '/export.csv')
+        with instrument.rerun('api') as trace, trace.stage(url.path if known else 'not_found'):
+            self._respond(url)
+
+    def _respond(self, url):
+        params = parse_qs(url.query)
+        try:
+            if url.path == '/health':
+                return self._send_json({'status': 'ok', 'version': self.engine.version,
+                                        'rows': len(self.engine.index.base)})
+            if url.path == '/industries':
+                return self._send_json({
+                    'target_industries': self.engine.target_industries,
+                    'other_sectors': self.engine.other_sectors(),
+                    'countries': self.engine.countries(),
+                    'years': list(self.engine.year_bounds()),
+                })
+            if url.path == '/export.csv':
+                return self._send_csv(parse_filters(self.engine, params))
+            handler = ROUTES.get(url.path)
+            if handler is None:
+                return self._send_json({'error': f'not found: {url.path}'}, 404)
+            key = parse_filters(self.engine, params)
+            self._send_json(handler(self.engine, params, key))
+        except BadRequest as e:
+            self._send_json({'error': str(e)}, 400)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(_plain(payload), ensure_ascii=False, allow_nan=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, text):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_csv(self, key):
+        """Chunked transfer of the filtered export, one encoded chunk at a time"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Content-Disposition', 'attachment; filename="china_investment_filtered.csv"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in iter_csv(self.engine.selection(key), self.engine.result):
+            self.wfile.write(f'{len(chunk):X}\r\n'.encode('ascii') + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def make_server(engine, host='127.0.0.1', port=8600):
+    """Threaded HTTP server answering from engine"""
+    handler = type('Handler', (APIHandler,), {'engine': engine, 'protocol_version': 'HTTP/1.1'})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HTTP/JSON API for the investment dashboard metrics')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--csv', default=DATA_FILE)
+    args = parser.parse_args()
+
+    engine = QueryEngine.from_path(args.csv)
+    if warmup.WARMUP:
+        warmup.warm(engine)  # before serving, so the first request finds the default view cached
+    server = make_server(engine, args.host, args.port)
+    print(f"✅ Serving {len(engine.index.base):,} projects (store {engine.version}) "
+          f"on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -4,6 +4,16 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import inspect
+import os
+from types import MappingProxyType
+
+from classifier import DATA_FILE, INDUSTRY_KEYWORDS
+from engine import DEFAULT_AMOUNT_RANGE, DEFAULT_OTHER_SECTORS, PROJECT_COLUMNS, QueryEngine
+from filter_cache import LRUCache, filter_key
+from export import export_file, parquet_available
+import instrument
+import warmup
 
 # Page configuration
 st.set_page_config(
@@ -33,6 +43,8 @@ TRANSLATIONS = {
         'total_investment': 'Total Investment',
         'avg_investment': 'Average Investment',
         'countries': 'Countries',
+        'approximate': 'Approximate overview (faster)',
+        'approximate_note': '≈ Amounts estimated from sketches; exact values are loading…',
         'tabs': {
             'trends': '📈 Trends',
             'geographic': '🌍 Geographic',
@@ -41,6 +53,12 @@ TRANSLATIONS = {
             'insights': '💡 Insights'
         },
         'trends_title': 'Investment Trends Over Time',
+        'granularity': 'Granularity',
+        'granularities': {
+            'year': 'Year',
+            'quarter': 'Quarter',
+            'month': 'Month'
+        },
         'geographic_title': 'Geographic Distribution',
         'select_industry_map': 'Select Industry for Map',
         'top_destinations': 'Top Destinations',
@@ -48,7 +66,11 @@ TRANSLATIONS = {
         'hhi_title': 'HHI Index by Industry',
         'top3_title': 'Top 3 Countries Share',
         'data_explorer_title': 'Data Explorer',
+        'page': 'Page',
+        'rows_shown': 'Rows {start:,}–{stop:,} of {total:,}, sorted by amount',
         'download_btn': '📥 Download Data as CSV',
+        'download_parquet': '📥 Download Data as Parquet',
+        'prepare_export': '⚙️ Prepare {fmt} Export',
         'insights_title': 'Key Insights',
         'investment_summary': 'Investment Summary:',
         'risk_assessment': 'Risk Assessment:',
@@ -64,7 +86,10 @@ TRANSLATIONS = {
         },
         'chart_labels': {
             'year': 'Year',
+            'period': 'Period',
             'investment': 'Investment (Million USD)',
+            'rolling': 'Rolling 12-Month Investment',
+            'yoy': 'YoY Growth (%)',
             'projects': 'Number of Projects',
             'country': 'Country',
             'amount': 'Investment (Million USD)',
@@ -90,6 +115,8 @@ TRANSLATIONS = {
         'total_investment': '总投资额',
         'avg_investment': '平均投资额',
         'countries': '国家数量',
+        'approximate': '近似概览（更快）',
+        'approximate_note': '≈ 金额为草图估算值，精确值加载中…',
         'tabs': {
             'trends': '📈 趋势分析',
             'geographic': '🌍 地理分布',
@@ -98,6 +125,12 @@ TRANSLATIONS = {
             'insights': '💡 关键洞察'
         },
         'trends_title': '投资趋势（按时间）',
+        'granularity': '时间粒度',
+        'granularities': {
+            'year': '年',
+            'quarter': '季度',
+            'month': '月'
+        },
         'geographic_title': '地理分布',
         'select_industry_map': '选择行业查看地图',
         'top_destinations': '主要投资目的地',
@@ -105,7 +138,11 @@ TRANSLATIONS = {
         'hhi_title': '各行业HHI指数',
         'top3_title': '前三大国家占比',
         'data_explorer_title': '数据浏览器',
+        'page': '页码',
+        'rows_shown': '第 {start:,}–{stop:,} 行，共 {total:,} 行（按投资额排序）',
         'download_btn': '📥 下载数据为CSV',
+        'download_parquet': '📥 下载数据为Parquet',
+        'prepare_export': '⚙️ 准备{fmt}导出',
         'insights_title': '关键洞察',
         'investment_summary': '投资概况：',
         'risk_assessment': '风险评估：',
@@ -121,7 +158,10 @@ TRANSLATIONS = {
         },
         'chart_labels': {
             'year': '年份',
+            'period': '时间',
             'investment': '投资额（百万美元）',
+            'rolling': '滚动12个月投资额',
+            'yoy': '同比增长 (%)',
             'projects': '项目数',
             'country': '国家',
             'amount': '投资额（百万美元）',
@@ -131,6 +171,24 @@ TRANSLATIONS = {
     }
 }
 
+def _flatten(table, prefix=''):
+    """Nested translation table as {dotted key: text}"""
+    flat = {}
+    for key, value in table.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+# Each language resolved once into read-only flat tables: dotted key -> text, and target
+# industry -> display name (other sectors keep their original name)
+TEXT = {lang: MappingProxyType(_flatten(table)) for lang, table in TRANSLATIONS.items()}
+INDUSTRY_NAMES = {
+    lang: MappingProxyType({ind: TEXT[lang][f'industries.{ind}'] for ind in INDUSTRY_KEYWORDS})
+    for lang in TRANSLATIONS
+}
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -159,107 +217,196 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Industry definitions (corrected: coal is energy, not mineral; focus on metal minerals)
-INDUSTRY_KEYWORDS = {
-    'Integrated Circuits': ['semiconductor', 'chip', 'wafer', 'foundry', 'chipmaker', 'integrated circuit'],
-    'Biopharmaceuticals': ['pharma', 'biotech', 'drug', 'medicine', 'healthcare', 'medical', 'clinic', 'vaccine', 'therapeutic'],
-    'New Energy Vehicles': ['electric vehicle', 'ev ', 'battery', 'auto', 'automotive', 'vehicle'],
-    'Mineral Resources': ['mining', 'mineral', 'copper', 'lithium', 'iron ore', 'cobalt', 'nickel', 'zinc', 'rare earth', 'metal']  # Removed: coal (energy), gold/silver (precious metals)
-}
+# Data Explorer rows sent to the browser per rerun
+PAGE_SIZE = 200
 
-EXCLUDE_PATTERNS = {
-    'Biopharmaceuticals': ['hospitality'],
-    'New Energy Vehicles': ['carlson', 'carmike', 'carrefour'],
-    'Mineral Resources': ['goldman', 'coal']  # Exclude coal (energy sector)
-}
+# Download data given as a callable is only exported when the button is clicked (newer
+# Streamlit); otherwise a "Prepare" button exports it for that one rerun, never on every rerun
+try:
+    from streamlit.elements.widgets.button import DownloadButtonDataType
+    DEFERRED_DOWNLOADS = 'Callable' in str(DownloadButtonDataType)
+except ImportError:
+    DEFERRED_DOWNLOADS = False
 
-@st.cache_data
-def load_data():
-    """Load and process data"""
-    df = pd.read_csv('china_investment_tracker.csv')
-    
-    # Clean amount
-    df['Amount'] = df['Millions'].str.replace('$', '', regex=False).str.replace(',', '').str.strip()
-    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-    
-    return df
+# Lazy tabs: only the selected tab's analytics run on a rerun. Needs st.tabs(on_change=...);
+# older Streamlit (or LAZY_TABS=0) renders every tab eagerly as before.
+LAZY_TABS = os.environ.get('LAZY_TABS', '1') != '0' and 'on_change' in inspect.signature(st.tabs).parameters
 
-def classify_accurate(row):
-    """Classify investment by industry"""
-    text = (str(row.get('Sector', '')) + ' ' + 
-            str(row.get('Subsector', '')) + ' ' + 
-            str(row.get('Partner/Target', '')) + ' ' + 
-            str(row.get('Investor', ''))).lower()
-    
-    matches = []
-    
-    # Check if it matches any target industry
-    for industry, keywords in INDUSTRY_KEYWORDS.items():
-        should_exclude = False
-        if industry in EXCLUDE_PATTERNS:
-            for exclude_word in EXCLUDE_PATTERNS[industry]:
-                if exclude_word in text:
-                    should_exclude = True
-                    break
-        
-        if should_exclude:
-            continue
-        
-        for keyword in keywords:
-            if keyword in text:
-                matches.append(industry)
-                break
-    
-    # If no match, use original Sector
-    if not matches:
-        sector = str(row.get('Sector', 'Other')).strip()
-        if sector and sector != 'nan' and sector != '':
-            matches.append(sector)
-        else:
-            matches.append('Other')
-    
-    return matches
+# Per-stage timings of each rerun: logged as JSON on the 'dashboard.timing' logger, shown in a
+# sidebar panel with DASHBOARD_DEBUG=1 (never from the URL alone: profiles include file paths), and
+# served as Prometheus text on METRICS_PORT
+DASHBOARD_DEBUG = os.environ.get('DASHBOARD_DEBUG') == '1'
+METRICS_PORT = os.environ.get('METRICS_PORT')
 
-@st.cache_data
-def process_data(df):
-    """Process and classify data"""
-    df['Industries'] = df.apply(classify_accurate, axis=1)
-    df_expanded = df.explode('Industries')
-    df_expanded = df_expanded[df_expanded['Industries'].notna()].copy()
-    
-    # Get all unique industries
-    all_industries = sorted(df_expanded['Industries'].unique())
-    
-    return df_expanded, all_industries
+# Approximate overview: metrics are first drawn from the amount sketches (marked ≈) and replaced
+# by the exact aggregates once those are computed. Sidebar toggle; on by default with APPROX_METRICS=1
+APPROX_METRICS = os.environ.get('APPROX_METRICS') == '1'
+
+@st.cache_resource
+def load_engine():
+    """Classified data, industry index, aggregate cube and filter cache (shared by all sessions)"""
+    return QueryEngine.from_path(DATA_FILE)
 
-def calculate_hhi(country_amounts):
-    """Calculate HHI index"""
-    total = country_amounts.sum()
-    if total == 0:
-        return 0
-    shares = (country_amounts / total * 100)
-    hhi = (shares ** 2).sum()
-    return hhi
+@st.cache_resource
+def get_industry_labels(_index, version, lang):
+    """Display name per industry code, for relabeling the Data Explorer in one take"""
+    return relabel_industries(lang, _index.industries)
+
+@st.cache_resource
+def get_figure_cache(version):
+    """Built chart figures memoized across sessions (per dataset version)"""
+    return LRUCache(maxsize=512, ttl=3600, name='figures')
+
+@st.cache_resource
+def start_metrics_server(port):
+    """Prometheus /metrics endpoint for this Streamlit process (started once; None if the port is taken)"""
+    try:
+        return instrument.serve_metrics(port)
+    except OSError as e:
+        # e.g. another worker on this host already serves it; the page itself is unaffected
+        instrument.logger.warning('metrics server not started on port %s: %s', port, e)
+        return None
+
+@st.cache_resource
+def start_warmup(_engine, _figure_cache, version):
+    """Default view's results and yearly Trends figures (every language) built in the background, once per version"""
+    key = _engine.key()
+    for lang in TRANSLATIONS:
+        trend_template(lang)  # st.cache_resource expects a script thread on a miss
+    
+    def figures():
+        stats = _engine.stats(key)
+        for lang in TRANSLATIONS:
+            for industry in key[0]:
+                _figure_cache.get_or_compute(('trends', industry, key, lang, 'year'),
+                                             lambda: trend_figure(lang, industry, stats.by_year(industry)))
+    
+    return warmup.start(_engine, then=figures)
 
 def get_text(lang, key):
     """Get translated text"""
-    keys = key.split('.')
-    text = TRANSLATIONS[lang]
-    for k in keys:
-        text = text[k]
-    return text
+    return TEXT[lang][key]
 
 def get_industry_name(lang, industry):
     """Get industry name - translate if target industry, otherwise use original"""
-    target_industries = list(INDUSTRY_KEYWORDS.keys())
-    if industry in target_industries:
-        return get_text(lang, f'industries.{industry}')
-    else:
-        # For other sectors, return original name (no translation)
-        return industry
+    return INDUSTRY_NAMES[lang].get(industry, industry)
+
+def relabel_industries(lang, industries):
+    """Display names for a column of industry names, looked up once per distinct name"""
+    codes, uniques = pd.factorize(np.asarray(industries, dtype=object))
+    names = INDUSTRY_NAMES[lang]
+    return np.array([names.get(ind, ind) for ind in uniques], dtype=object)[codes]
+
+@st.cache_resource
+def trend_template(lang):
+    """Dual-axis Trends figure without data; each chart copies it and swaps in its arrays"""
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    
+    fig.add_trace(
+        go.Bar(name=get_text(lang, 'chart_labels.investment'), marker_color='steelblue'),
+        secondary_y=False,
+    )
+    
+    fig.add_trace(
+        go.Scatter(name=get_text(lang, 'chart_labels.projects'), mode='lines+markers',
+                   marker=dict(size=8, color='red'), line=dict(width=2, color='red')),
+        secondary_y=True,
+    )
+    
+    fig.update_xaxes(title_text=get_text(lang, 'chart_labels.year'))
+    fig.update_yaxes(title_text=get_text(lang, 'chart_labels.investment'), secondary_y=False)
+    fig.update_yaxes(title_text=get_text(lang, 'chart_labels.projects'), secondary_y=True)
+    fig.update_layout(hovermode='x unified', height=400)
+    return fig
+
+def trend_figure(lang, industry, yearly):
+    """Trends chart for one industry, or None when it has no projects"""
+    if len(yearly) == 0:
+        return None
+    
+    fig = go.Figure(trend_template(lang))
+    with fig.batch_update():
+        fig.data[0].x = yearly['Year']
+        fig.data[0].y = yearly['Total_Investment']
+        fig.data[1].x = yearly['Year']
+        fig.data[1].y = yearly['Project_Count']
+        fig.layout.title.text = f"{get_industry_name(lang, industry)} - {get_text(lang, 'trends_title')}"
+    return fig
+
+@st.cache_resource
+def period_template(lang):
+    """Monthly / quarterly Trends figure without data: amount bars, rolling 12-month line, YoY on the right axis"""
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    
+    fig.add_trace(
+        go.Bar(name=get_text(lang, 'chart_labels.investment'), marker_color='steelblue'),
+        secondary_y=False,
+    )
+    
+    fig.add_trace(
+        go.Scatter(name=get_text(lang, 'chart_labels.rolling'), mode='lines',
+                   line=dict(width=2, color='darkorange')),
+        secondary_y=False,
+    )
+    
+    fig.add_trace(
+        go.Scatter(name=get_text(lang, 'chart_labels.yoy'), mode='lines+markers',
+                   marker=dict(size=5, color='red'), line=dict(width=1, color='red', dash='dot')),
+        secondary_y=True,
+    )
+    
+    fig.update_xaxes(title_text=get_text(lang, 'chart_labels.period'), type='category')
+    fig.update_yaxes(title_text=get_text(lang, 'chart_labels.investment'), secondary_y=False)
+    fig.update_yaxes(title_text=get_text(lang, 'chart_labels.yoy'), secondary_y=True)
+    fig.update_layout(hovermode='x unified', height=400)
+    return fig
+
+def period_figure(lang, industry, series):
+    """Monthly or quarterly Trends chart for one industry, or None when it has no projects"""
+    if series['Project_Count'].sum() == 0:
+        return None
+    
+    fig = go.Figure(period_template(lang))
+    with fig.batch_update():
+        for trace, column in zip(fig.data, ['Total_Investment', 'Rolling_Investment', 'YoY_%']):
+            trace.x = series['Period']
+            trace.y = series[column]
+        fig.layout.title.text = f"{get_industry_name(lang, industry)} - {get_text(lang, 'trends_title')}"
+    return fig
+
+def tab_open(tab):
+    """Whether a tab's content should be computed (always, unless tabs are lazy and it is hidden)"""
+    return getattr(tab, 'open', None) is not False
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart, timed as the 'plotly' stage (figure serialization)"""
+    with instrument.current().stage('plotly'):
+        st.plotly_chart(fig, **kwargs)
+
+def debug_enabled():
+    return DASHBOARD_DEBUG
+
+def render_debug_panel(trace):
+    """Sidebar panel with the stage timings, cache lookups and profile of the rerun just finished"""
+    with st.sidebar.expander('⏱ Performance', expanded=True):
+        st.caption(f"Rerun: {trace.seconds * 1000:.1f} ms")
+        st.dataframe(pd.DataFrame(
+            [(name, entry['seconds'] * 1000, entry['calls'], entry['rows']) for name, entry in trace.stages.items()],
+            columns=['Stage', 'ms', 'Calls', 'Rows']
+        ).astype({'Rows': 'Int64'}), hide_index=True, use_container_width=True)
+        if trace.caches:
+            st.dataframe(pd.DataFrame(
+                [(name, entry['hits'], entry['misses']) for name, entry in trace.caches.items()],
+                columns=['Cache', 'Hits', 'Misses']
+            ), hide_index=True, use_container_width=True)
+        st.checkbox('Profile reruns (cProfile)', key='profile_reruns')
+        if trace.profile:
+            st.code(trace.profile, language=None)
 
 # Main app
 def main():
+    trace = instrument.current()
+    
     # Language selector in sidebar (at the top)
     lang = st.sidebar.selectbox(
         "🌐 Language / 语言",
@@ -274,23 +421,26 @@ def main():
     
     # Load data
     with st.spinner('Loading data...' if lang == 'en' else '加载数据中...'):
-        df = load_data()
-        df_expanded, all_industries = process_data(df)
+        with trace.stage('load'):
+            engine = load_engine()
+            index = engine.index
+            figure_cache = get_figure_cache(engine.version)
+            if warmup.WARMUP:
+                start_warmup(engine, figure_cache, engine.version)
+        trace.rows('load', len(index.base))
     
     # Sidebar filters
     st.sidebar.header(get_text(lang, 'filters'))
     
     # Industry selection - separate target industries and other sectors
-    target_industries = list(INDUSTRY_KEYWORDS.keys())
-    other_sectors = [ind for ind in all_industries if ind not in target_industries]
+    target_industries = engine.target_industries
     
-    # Sort other sectors by frequency (number of projects)
-    sector_counts = df_expanded[df_expanded['Industries'].isin(other_sectors)]['Industries'].value_counts()
-    other_sectors_sorted = [s for s in sector_counts.index if s in other_sectors]
+    # Other sectors sorted by frequency (number of projects)
+    other_sectors_sorted = engine.other_sectors()
     
     # Target industries (with translation)
     st.sidebar.markdown(f"**{'🎯 ' + get_text(lang, 'target_industries') if lang == 'zh' else '🎯 Target Industries'}**")
-    target_display = [get_text(lang, f'industries.{ind}') for ind in target_industries]
+    target_display = [get_industry_name(lang, ind) for ind in target_industries]
     selected_target_display = st.sidebar.multiselect(
         get_text(lang, 'select_industries'),
         target_display,
@@ -300,7 +450,7 @@ def main():
     
     # Other sectors (no translation needed) - default to top 10 by frequency
     st.sidebar.markdown(f"**{'📊 ' + (get_text(lang, 'other_sectors') if lang == 'zh' else 'Other Sectors')}**")
-    default_other = other_sectors_sorted[:10] if len(other_sectors_sorted) > 10 else other_sectors_sorted
+    default_other = other_sectors_sorted[:DEFAULT_OTHER_SECTORS]
     selected_other_sectors = st.sidebar.multiselect(
         get_text(lang, 'select_industries') if lang == 'zh' else 'Select Sectors',
         other_sectors_sorted,  # Show sorted by frequency
@@ -309,11 +459,11 @@ def main():
     )
     
     # Map display names back to English keys and combine all selections
-    display_to_key = {get_text(lang, f'industries.{ind}'): ind for ind in target_industries}
+    display_to_key = dict(zip(target_display, target_industries))
     selected_industries = [display_to_key[d] for d in selected_target_display] + selected_other_sectors
     
     # Year range
-    year_min, year_max = int(df['Year'].min()), int(df['Year'].max())
+    year_min, year_max = engine.year_bounds()
     year_range = st.sidebar.slider(
         get_text(lang, 'year_range'),
         year_min, year_max,
@@ -321,7 +471,7 @@ def main():
     )
     
     # Country filter
-    all_countries = sorted(df_expanded['Country'].dropna().unique())
+    all_countries = engine.countries()
     selected_countries = st.sidebar.multiselect(
         get_text(lang, 'filter_country'),
         all_countries,
@@ -330,56 +480,82 @@ def main():
     
     # Amount filter
     st.sidebar.subheader(get_text(lang, 'amount_range'))
-    min_amount = st.sidebar.number_input(get_text(lang, 'min_amount'), value=0, step=100)
-    max_amount = st.sidebar.number_input(get_text(lang, 'max_amount'), value=50000, step=100)
+    min_amount = st.sidebar.number_input(get_text(lang, 'min_amount'), value=DEFAULT_AMOUNT_RANGE[0], step=100)
+    max_amount = st.sidebar.number_input(get_text(lang, 'max_amount'), value=DEFAULT_AMOUNT_RANGE[1], step=100)
     
-    # Apply filters
-    filtered_df = df_expanded[
-        (df_expanded['Industries'].isin(selected_industries)) &
-        (df_expanded['Year'] >= year_range[0]) &
-        (df_expanded['Year'] <= year_range[1]) &
-        (df_expanded['Amount'] >= min_amount) &
-        (df_expanded['Amount'] <= max_amount)
-    ]
+    approximate = st.sidebar.toggle(get_text(lang, 'approximate'), value=APPROX_METRICS, key='approximate')
     
-    if selected_countries:
-        filtered_df = filtered_df[filtered_df['Country'].isin(selected_countries)]
+    # Apply filters (aggregates come from the cube; rows are only needed by the Data Explorer)
+    key = filter_key(
+        selected_industries,
+        year_range=year_range,
+        amount_range=(min_amount, max_amount),
+        countries=selected_countries
+    )
+    
+    def show_overview(summary, marker=''):
+        """The four overview metrics of a CubeSlice or SketchSlice; marker ('≈ ') flags estimated amounts"""
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric(
+                get_text(lang, 'total_projects'),
+                f"{len(summary):,}",
+                delta=None
+            )
+        
+        with col2:
+            total_investment = summary.total_amount()
+            st.metric(
+                get_text(lang, 'total_investment'),
+                f"{marker}${total_investment/1000:.1f}B",
+                delta=None
+            )
+        
+        with col3:
+            avg_investment = summary.mean_amount()
+            st.metric(
+                get_text(lang, 'avg_investment'),
+                f"{marker}${avg_investment:.1f}M",
+                delta=None
+            )
+        
+        with col4:
+            num_countries = summary.country_count()
+            st.metric(
+                get_text(lang, 'countries'),
+                f"{num_countries}",
+                delta=None
+            )
     
     # Overview metrics
     st.markdown(f'<div class="sub-header">{get_text(lang, "overview")}</div>', unsafe_allow_html=True)
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric(
-            get_text(lang, 'total_projects'),
-            f"{len(filtered_df):,}",
-            delta=None
-        )
-    
-    with col2:
-        total_investment = filtered_df['Amount'].sum()
-        st.metric(
-            get_text(lang, 'total_investment'),
-            f"${total_investment/1000:.1f}B",
-            delta=None
-        )
-    
-    with col3:
-        avg_investment = filtered_df['Amount'].mean()
-        st.metric(
-            get_text(lang, 'avg_investment'),
-            f"${avg_investment:.1f}M",
-            delta=None
-        )
-    
-    with col4:
-        num_countries = filtered_df['Country'].nunique()
-        st.metric(
-            get_text(lang, 'countries'),
-            f"{num_countries}",
-            delta=None
-        )
+    overview, note = st.empty(), st.empty()
+    
+    # Approximate mode: the sketch estimate (exact counts, amounts marked ≈) is sent to the browser
+    # first. The exact aggregates are then computed in this same rerun and overwrite it
+    if approximate:
+        with trace.stage('estimate'):
+            estimate = engine.estimate(key)
+        with overview.container():
+            show_overview(estimate, marker='≈ ')
+        note.caption(get_text(lang, 'approximate_note'))
+    
+    # Aggregates for the overview and every tab, memoized on the canonical filter state
+    with trace.stage('filter'):
+        stats = engine.stats(key)
+    trace.rows('filter', len(stats))
+    
+    def get_concentration():
+        """HHI / top-3 share / destinations for all industries at once (Concentration + Insights tabs)"""
+        with trace.stage('concentration'):
+            concentration = engine.concentration(key)
+        conc_stats = concentration.frame.reindex([i for i in selected_industries if i in concentration.frame.index])
+        return concentration, conc_stats
+    
+    with overview.container():
+        show_overview(stats)
+    note.empty()
     
     # Tabs for different views
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -388,228 +564,224 @@ def main():
         get_text(lang, 'tabs.concentration'),
         get_text(lang, 'tabs.explorer'),
         get_text(lang, 'tabs.insights')
-    ])
-    
-    with tab1:
-        st.markdown(f"### {get_text(lang, 'trends_title')}")
-        
-        # Time series by industry
-        for industry in selected_industries:
-            industry_df = filtered_df[filtered_df['Industries'] == industry]
-            
-            if len(industry_df) == 0:
-                continue
-            
-            yearly = industry_df.groupby('Year').agg({
-                'Amount': ['sum', 'count']
-            }).reset_index()
-            yearly.columns = ['Year', 'Total_Investment', 'Project_Count']
-            
-            # Create dual-axis chart
-            fig = make_subplots(specs=[[{"secondary_y": True}]])
-            
-            fig.add_trace(
-                go.Bar(x=yearly['Year'], y=yearly['Total_Investment'], 
-                       name=get_text(lang, 'chart_labels.investment'), marker_color='steelblue'),
-                secondary_y=False,
-            )
-            
-            fig.add_trace(
-                go.Scatter(x=yearly['Year'], y=yearly['Project_Count'], 
-                          name=get_text(lang, 'chart_labels.projects'), mode='lines+markers',
-                          marker=dict(size=8, color='red'), line=dict(width=2, color='red')),
-                secondary_y=True,
-            )
-            
-            fig.update_xaxes(title_text=get_text(lang, 'chart_labels.year'))
-            fig.update_yaxes(title_text=get_text(lang, 'chart_labels.investment'), secondary_y=False)
-            fig.update_yaxes(title_text=get_text(lang, 'chart_labels.projects'), secondary_y=True)
-            
-            industry_name = get_industry_name(lang, industry)
-            fig.update_layout(
-                title_text=f"{industry_name} - {get_text(lang, 'trends_title')}",
-                hovermode='x unified',
-                height=400
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-    
-    with tab2:
-        st.markdown(f"### {get_text(lang, 'geographic_title')}")
-        
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            # Top countries by industry
-            industry_display_options = [get_industry_name(lang, ind) for ind in selected_industries]
-            # Build reverse mapping for both target and other industries
-            display_to_industry = {get_industry_name(lang, ind): ind for ind in selected_industries}
-            industry_select_display = st.selectbox(get_text(lang, 'select_industry_map'), industry_display_options)
-            industry_select = display_to_industry[industry_select_display]
-            
-            industry_df = filtered_df[filtered_df['Industries'] == industry_select]
-            
-            country_stats = industry_df.groupby('Country').agg({
-                'Amount': ['sum', 'count']
-            }).reset_index()
-            country_stats.columns = ['Country', 'Total_Investment', 'Project_Count']
-            country_stats = country_stats.sort_values('Total_Investment', ascending=False).head(15)
-            
-            fig = px.bar(
-                country_stats,
-                x='Total_Investment',
-                y='Country',
-                orientation='h',
-                title=f'{industry_select_display} - Top 15',
-                labels={'Total_Investment': get_text(lang, 'chart_labels.amount'), 'Country': ''},
-                color='Total_Investment',
-                color_continuous_scale='Teal'
+    ], **(dict(key=f'tabs_{lang}', on_change='rerun') if LAZY_TABS else {}))
+    
+    with tab1, trace.stage('tab.trends'):
+        if tab_open(tab1):
+            st.markdown(f"### {get_text(lang, 'trends_title')}")
+            granularity = st.radio(
+                get_text(lang, 'granularity'),
+                ['year', 'quarter', 'month'],
+                format_func=lambda g: get_text(lang, f'granularities.{g}'),
+                horizontal=True,
+                key='trend_granularity'
             )
-            fig.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.markdown(f"#### {get_text(lang, 'top_destinations')}")
-            for idx, row in country_stats.head(10).iterrows():
-                st.markdown(f"""
-                **{row['Country']}**  
-                💰 ${row['Total_Investment']:,.0f}M  
-                📊 {int(row['Project_Count'])} {'projects' if lang == 'en' else '个项目'}
-                """)
-    
-    with tab3:
-        st.markdown(f"### {get_text(lang, 'concentration_title')}")
-        
-        concentration_data = []
-        
-        for industry in selected_industries:
-            industry_df = filtered_df[filtered_df['Industries'] == industry]
-            
-            if len(industry_df) == 0:
-                continue
-            
-            country_amounts = industry_df.groupby('Country')['Amount'].sum().sort_values(ascending=False)
-            total_amount = country_amounts.sum()
-            
-            if total_amount == 0:
-                continue
             
-            shares = (country_amounts / total_amount * 100)
-            hhi = calculate_hhi(country_amounts)
-            top3_share = shares.head(3).sum()
-            
-            concentration_data.append({
-                'Industry': get_industry_name(lang, industry),
-                'HHI_Index': round(hhi, 1),
-                'Top3_Share_%': round(top3_share, 1),
-                'Num_Countries': len(country_amounts),
-                'Top_Destination': country_amounts.index[0] if len(country_amounts) > 0 else 'N/A'
-            })
+            # Time series by industry (figures memoized per filter state, granularity and language);
+            # months and quarters come from the rollup's prefix sums
+            for industry in selected_industries:
+                if granularity == 'year':
+                    build = lambda: trend_figure(lang, industry, stats.by_year(industry))
+                else:
+                    build = lambda: period_figure(lang, industry, engine.periods(key).series(industry, granularity))
+                fig = figure_cache.get_or_compute(('trends', industry, key, lang, granularity), build)
+                
+                if fig is None:
+                    continue
+                
+                plotly_chart(fig, use_container_width=True)
         
-        if concentration_data:
-            conc_df = pd.DataFrame(concentration_data)
+    with tab2, trace.stage('tab.geographic'):
+        if tab_open(tab2):
+            st.markdown(f"### {get_text(lang, 'geographic_title')}")
             
-            col1, col2 = st.columns(2)
+            col1, col2 = st.columns([2, 1])
             
             with col1:
+                # Top countries by industry
+                industry_display_options = relabel_industries(lang, selected_industries).tolist()
+                # Build reverse mapping for both target and other industries
+                display_to_industry = dict(zip(industry_display_options, selected_industries))
+                industry_select_display = st.selectbox(get_text(lang, 'select_industry_map'), industry_display_options)
+                industry_select = display_to_industry[industry_select_display]
+                
+                country_stats = stats.by_country(industry_select).head(15)
+                
                 fig = px.bar(
-                    conc_df,
-                    x='Industry',
-                    y='HHI_Index',
-                    title=get_text(lang, 'hhi_title'),
-                    color='HHI_Index',
-                    color_continuous_scale='RdYlGn_r',
-                    labels={'HHI_Index': get_text(lang, 'chart_labels.hhi'), 'Industry': ''}
+                    country_stats,
+                    x='Total_Investment',
+                    y='Country',
+                    orientation='h',
+                    title=f'{industry_select_display} - Top 15',
+                    labels={'Total_Investment': get_text(lang, 'chart_labels.amount'), 'Country': ''},
+                    color='Total_Investment',
+                    color_continuous_scale='Teal'
                 )
-                fig.add_hline(y=1000, line_dash="dash", line_color="green", 
-                             annotation_text="Low" if lang == 'en' else "低")
-                fig.add_hline(y=1800, line_dash="dash", line_color="red",
-                             annotation_text="High" if lang == 'en' else "高")
-                fig.update_layout(height=400, showlegend=False)
-                st.plotly_chart(fig, use_container_width=True)
+                fig.update_layout(height=500, showlegend=False)
+                plotly_chart(fig, use_container_width=True)
             
             with col2:
-                fig = px.bar(
-                    conc_df,
-                    x='Industry',
-                    y='Top3_Share_%',
-                    title=get_text(lang, 'top3_title'),
-                    color='Top3_Share_%',
-                    color_continuous_scale='Blues',
-                    labels={'Top3_Share_%': get_text(lang, 'chart_labels.share'), 'Industry': ''}
-                )
-                fig.add_hline(y=50, line_dash="dash", line_color="orange",
-                             annotation_text="50%")
-                fig.update_layout(height=400, showlegend=False)
-                st.plotly_chart(fig, use_container_width=True)
-            
-            st.dataframe(conc_df, use_container_width=True)
-    
-    with tab4:
-        st.markdown(f"### {get_text(lang, 'data_explorer_title')}")
+                st.markdown(f"#### {get_text(lang, 'top_destinations')}")
+                for idx, row in country_stats.head(10).iterrows():
+                    st.markdown(f"""
+                    **{row['Country']}**  
+                    💰 ${row['Total_Investment']:,.0f}M  
+                    📊 {int(row['Project_Count'])} {'projects' if lang == 'en' else '个项目'}
+                    """)
         
-        # Display filtered data
-        display_df = filtered_df[[
-            'Year', 'Month', 'Industries', 'Investor', 'Amount', 
-            'Partner/Target', 'Country', 'Region', 'Sector', 'Subsector'
-        ]].sort_values('Amount', ascending=False)
-        
-        # Translate industry names in display
-        if lang == 'zh':
-            display_df['Industries'] = display_df['Industries'].apply(
-                lambda x: get_industry_name(lang, x)
-            )
-        
-        st.dataframe(display_df, use_container_width=True, height=500)
-    
-    with tab5:
-        st.markdown(f"### {get_text(lang, 'insights_title')}")
-        
-        for industry in selected_industries:
-            industry_df = filtered_df[filtered_df['Industries'] == industry]
+    with tab3, trace.stage('tab.concentration'):
+        if tab_open(tab3):
+            st.markdown(f"### {get_text(lang, 'concentration_title')}")
             
-            if len(industry_df) == 0:
-                continue
+            concentration, conc_stats = get_concentration()
+            conc = conc_stats[(conc_stats['Project_Count'] > 0) & (conc_stats['Country_Total'] > 0)]
             
-            industry_name = get_industry_name(lang, industry)
-            st.markdown(f"#### {industry_name}")
+            if len(conc) > 0:
+                conc_df = pd.DataFrame({
+                    'Industry': relabel_industries(lang, conc.index),
+                    'HHI_Index': [round(v, 1) for v in conc['HHI_Index']],
+                    'Top3_Share_%': [round(v, 1) for v in conc['Top3_Share_%']],
+                    'Num_Countries': conc['Num_Countries'].to_numpy(),
+                    'Top_Destination': conc['Top_Destination'].fillna('N/A').to_numpy()
+                })
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    fig = px.bar(
+                        conc_df,
+                        x='Industry',
+                        y='HHI_Index',
+                        title=get_text(lang, 'hhi_title'),
+                        color='HHI_Index',
+                        color_continuous_scale='RdYlGn_r',
+                        labels={'HHI_Index': get_text(lang, 'chart_labels.hhi'), 'Industry': ''}
+                    )
+                    fig.add_hline(y=1000, line_dash="dash", line_color="green", 
+                                 annotation_text="Low" if lang == 'en' else "低")
+                    fig.add_hline(y=1800, line_dash="dash", line_color="red",
+                                 annotation_text="High" if lang == 'en' else "高")
+                    fig.update_layout(height=400, showlegend=False)
+                    plotly_chart(fig, use_container_width=True)
+                
+                with col2:
+                    fig = px.bar(
+                        conc_df,
+                        x='Industry',
+                        y='Top3_Share_%',
+                        title=get_text(lang, 'top3_title'),
+                        color='Top3_Share_%',
+                        color_continuous_scale='Blues',
+                        labels={'Top3_Share_%': get_text(lang, 'chart_labels.share'), 'Industry': ''}
+                    )
+                    fig.add_hline(y=50, line_dash="dash", line_color="orange",
+                                 annotation_text="50%")
+                    fig.update_layout(height=400, showlegend=False)
+                    plotly_chart(fig, use_container_width=True)
+                
+                st.dataframe(conc_df, use_container_width=True)
+        
+    with tab4, trace.stage('tab.explorer'):
+        if tab_open(tab4):
+            st.markdown(f"### {get_text(lang, 'data_explorer_title')}")
             
-            total_inv = industry_df['Amount'].sum()
-            num_projects = len(industry_df)
-            avg_inv = industry_df['Amount'].mean()
+            # Sorted and paginated server-side: only the current page is sent
+            selection = engine.selection(key)
+            total = len(selection)
+            trace.rows('tab.explorer', total)
+            num_pages = max(1, -(-total // PAGE_SIZE))
+            page = st.number_input(get_text(lang, 'page'), min_value=1, max_value=num_pages, value=1, step=1)
+            start = (int(page) - 1) * PAGE_SIZE
+            stop = min(start + PAGE_SIZE, total)
             
-            top_country = industry_df.groupby('Country')['Amount'].sum().sort_values(ascending=False)
+            # Industry names are relabeled per code (translated for zh), not per row
+            labels = get_industry_labels(index, engine.version, lang)
+            display_df = selection.page(PROJECT_COLUMNS, start, stop, industry_labels=labels)
             
-            col1, col2 = st.columns([2, 1])
+            st.caption(get_text(lang, 'rows_shown').format(start=start + 1 if total else 0, stop=stop, total=total))
+            st.dataframe(display_df, use_container_width=True, height=500)
             
-            with col1:
-                st.markdown(f"""
-                **{get_text(lang, 'investment_summary')}**
-                - {'Total Investment' if lang == 'en' else '总投资额'}: **${total_inv:,.0f}M** (${total_inv/1000:.1f}B)
-                - {'Number of Projects' if lang == 'en' else '项目数量'}: **{num_projects}**
-                - {'Average Investment' if lang == 'en' else '平均投资额'}: **${avg_inv:,.0f}M**
-                - {'Top Destination' if lang == 'en' else '第一目的地'}: **{top_country.index[0]}** (${top_country.iloc[0]:,.0f}M)
+            # Export of the whole filtered view (project-list column layout). Streamlit holds the
+            # finished file in memory to serve it; only api.py's /export.csv streams it
+            formats = [('csv', 'download_btn', 'text/csv')]
+            if parquet_available():
+                formats.append(('parquet', 'download_parquet', 'application/vnd.apache.parquet'))
+            for col, (fmt, label, mime) in zip(st.columns(len(formats)), formats):
+                with col:
+                    def export(fmt=fmt):
+                        # Streamlit only takes bytes or plain file objects, not a spooled file
+                        with export_file(selection, engine.result, fmt, industry_labels=labels) as f:
+                            return f.read()
+                    if DEFERRED_DOWNLOADS or st.button(get_text(lang, 'prepare_export').format(fmt=fmt.upper()),
+                                                       key=f'prepare_{fmt}'):
+                        st.download_button(
+                            get_text(lang, label),
+                            data=export if DEFERRED_DOWNLOADS else export(),
+                            file_name=f'china_investment_filtered.{fmt}',
+                            mime=mime
+                        )
+        
+    with tab5, trace.stage('tab.insights'):
+        if tab_open(tab5):
+            st.markdown(f"### {get_text(lang, 'insights_title')}")
+            
+            concentration, conc_stats = get_concentration()
+            for industry in conc_stats.index:
+                industry_stats = conc_stats.loc[industry]
                 
-                **{get_text(lang, 'risk_assessment')}**
-                """)
+                if industry_stats['Num_Countries'] == 0:
+                    continue
                 
-                # Calculate concentration level
-                hhi = calculate_hhi(top_country)
-                if hhi > 1800:
-                    st.error(get_text(lang, 'high_risk'))
-                elif hhi > 1000:
-                    st.warning(get_text(lang, 'med_risk'))
-                else:
-                    st.success(get_text(lang, 'low_risk'))
-            
-            with col2:
-                # Top 5 countries
-                st.markdown(f"**{get_text(lang, 'top_5_dest')}**")
-                for idx, (country, amount) in enumerate(top_country.head(5).items(), 1):
-                    pct = (amount / total_inv * 100) if total_inv > 0 else 0
-                    st.markdown(f"{idx}. {country} ({pct:.1f}%)")
-            
-            st.markdown("---")
+                industry_name = get_industry_name(lang, industry)
+                st.markdown(f"#### {industry_name}")
+                
+                total_inv = industry_stats['Total_Investment']
+                num_projects = int(industry_stats['Project_Count'])
+                avg_inv = total_inv / num_projects
+                
+                top_country = concentration.top(industry, 5)
+                
+                col1, col2 = st.columns([2, 1])
+                
+                with col1:
+                    st.markdown(f"""
+                    **{get_text(lang, 'investment_summary')}**
+                    - {'Total Investment' if lang == 'en' else '总投资额'}: **${total_inv:,.0f}M** (${total_inv/1000:.1f}B)
+                    - {'Number of Projects' if lang == 'en' else '项目数量'}: **{num_projects}**
+                    - {'Average Investment' if lang == 'en' else '平均投资额'}: **${avg_inv:,.0f}M**
+                    - {'Top Destination' if lang == 'en' else '第一目的地'}: **{top_country.index[0]}** (${top_country.iloc[0]:,.0f}M)
+                    
+                    **{get_text(lang, 'risk_assessment')}**
+                    """)
+                    
+                    # Concentration level
+                    hhi = industry_stats['HHI_Index']
+                    if hhi > 1800:
+                        st.error(get_text(lang, 'high_risk'))
+                    elif hhi > 1000:
+                        st.warning(get_text(lang, 'med_risk'))
+                    else:
+                        st.success(get_text(lang, 'low_risk'))
+                
+                with col2:
+                    # Top 5 countries
+                    st.markdown(f"**{get_text(lang, 'top_5_dest')}**")
+                    for idx, (country, amount) in enumerate(top_country.head(5).items(), 1):
+                        pct = (amount / total_inv * 100) if total_inv > 0 else 0
+                        st.markdown(f"{idx}. {country} ({pct:.1f}%)")
+                
+                st.markdown("---")
+
+def run():
+    """One rerun of main(), traced (and cProfiled when asked for in the debug panel or with ?profile=1 under DASHBOARD_DEBUG=1)"""
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
+    debug = debug_enabled()
+    profile = debug and (st.session_state.get('profile_reruns', False) or st.query_params.get('profile') == '1')
+    with instrument.rerun('rerun', profile=profile) as trace:
+        main()
+    if debug:
+        render_debug_panel(trace)
 
 if __name__ == "__main__":
-    main()
+    run()
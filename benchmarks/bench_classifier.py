@@ -0,0 +1,54 @@
+"""Benchmark: compiled KeywordClassifier vs row-wise df.apply(classify_accurate)
+
+Usage: python benchmarks/bench_classifier.py [--scale 50] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classifier import KeywordClassifier, classify_accurate  # noqa: E402
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'china_investment_tracker.csv'))
+    parser.add_argument('--scale', type=int, default=50, help='times the CSV is repeated')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    df = pd.concat([df] * args.scale, ignore_index=True)
+    rows = len(df)
+
+    classifier = KeywordClassifier()
+    apply_time, expected = best_time(lambda: df.apply(classify_accurate, axis=1).tolist(), args.repeat)
+    engine_time, result = best_time(lambda: classifier.classify(df), args.repeat)
+
+    if result.labels() != expected:
+        print('❌ KeywordClassifier labels differ from classify_accurate')
+        sys.exit(1)
+
+    print(f"{'path':<20} {'seconds':>10} {'rows/sec':>14}")
+    print(f"{'apply':<20} {apply_time:>10.3f} {rows / apply_time:>14,.0f}")
+    print(f"{'KeywordClassifier':<20} {engine_time:>10.3f} {rows / engine_time:>14,.0f}")
+    print(f"✅ {rows:,} rows, identical labels, speedup {apply_time / engine_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
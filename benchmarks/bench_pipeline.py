@@ -0,0 +1,237 @@
+"""Benchmark: load → classify → store → index → cube → rollup → sketch → filter → aggregate → render
+
+Times every stage of the dashboard pipeline on synthetic tracker datasets
+(see synthetic.py) and records each stage's peak traced memory. With
+--check, results are compared against a stored baseline and the run fails
+when a stage is slower (or peaks higher) than the baseline by more than the
+tolerance; --save-baseline records the current run as the new baseline.
+
+Each run also times a fixed NumPy / pandas / Python workload (calibrate).
+Baseline timings are scaled up by how much slower it ran than in the
+baseline, so a baseline recorded on one machine still applies on a slower or
+busier one. The row-wise reference classifier (classify_apply) is timed but
+never fails the check.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 2.4k 100k] [--repeat 3] [--check | --save-baseline]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classifier import (RULESETS, ClassifiedDataset, classify_accurate, classify_parallel, load_dataset,  # noqa: E402
+                        load_tracker, save_dataset)
+from cube import AggregateCube  # noqa: E402
+from engine import PROJECT_COLUMNS, QueryEngine  # noqa: E402
+from industry_index import IndustryIndex  # noqa: E402
+from rollup import PeriodRollup  # noqa: E402
+from sketch import AmountSketch  # noqa: E402
+from synthetic import SIZES, dataset_path  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Row-wise df.apply(classify_accurate) is only timed up to this many rows
+APPLY_LIMIT = 100_000
+# Reference paths that are timed for comparison but are not product code, so never fail --check
+UNCHECKED = {'classify_apply'}
+
+
+def measure(func, repeat, memory=True):
+    """(best seconds, peak traced MB, result) of func"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def calibrate():
+    """Fixed work (sort, groupby, a Python loop) whose time tracks the machine, not this repo"""
+    rng = np.random.default_rng(0)
+    values = rng.random(1_000_000)
+    np.sort(values)
+    pd.Series(values).groupby(rng.integers(0, 1000, size=len(values))).sum()
+    return sum(i * i for i in range(300_000))
+
+
+def app_trend_figure():
+    """The app's Trends figure builder (importing the app outside `streamlit run` prints warnings)"""
+    with contextlib.redirect_stderr(io.StringIO()):
+        import streamlit.logger
+        streamlit.logger.set_log_level('error')
+        from app import trend_figure
+    return trend_figure
+
+
+def render_trends(trend_figure, key, stats):
+    """Build and serialize the Trends figures the way the app does"""
+    size = 0
+    for industry in key[0]:
+        fig = trend_figure('en', industry, stats.by_year(industry))
+        if fig is not None:
+            size += len(pio.to_json(fig.to_dict(), validate=False))
+    return size
+
+
+def run_size(size, repeat, memory=True, workers=1):
+    """Stage → {'seconds', 'peak_mb'} for one dataset size"""
+    path = dataset_path(size)
+    results = {}
+    # Stages too slow to repeat on big datasets run once there (and are noisier)
+    once = repeat if (SIZES[size] or 0) <= APPLY_LIMIT else 1
+
+    def stage(name, func, times=repeat):
+        seconds, peak, value = measure(func, times, memory)
+        results[name] = {'seconds': round(seconds, 6), 'peak_mb': None if peak is None else round(peak, 3)}
+        print(f"  {name:<18} {seconds:>10.4f}s" + ('' if peak is None else f" {peak:>10.1f} MB"), flush=True)
+        return value
+
+    reference = measure(calibrate, max(repeat, 10), memory=False)[0]
+
+    df = stage('load', lambda: load_tracker(path), times=once)
+    rows = len(df)
+    if rows <= APPLY_LIMIT:
+        stage('classify_apply', lambda: df.apply(classify_accurate, axis=1).tolist(), times=1)
+    results_by_ruleset = stage('classify', lambda: {name: clf.classify(df) for name, clf in RULESETS.items()})
+    if workers > 1:
+        stage('classify_parallel', lambda: classify_parallel(df, workers=workers), times=once)
+    dataset = ClassifiedDataset(df, results_by_ruleset)
+
+    tmp = tempfile.mkdtemp(prefix='bench-store-')
+    try:
+        directory = os.path.join(tmp, 'store')
+        stage('store_save', lambda: save_dataset(dataset, directory), times=once)
+        stage('store_load', lambda: load_dataset(directory))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    index = stage('index', lambda: IndustryIndex.from_result(df, dataset.results['dashboard']))
+    cube = stage('cube', lambda: AggregateCube(index))
+    rollup = stage('rollup', lambda: PeriodRollup(index))
+    sketch = stage('sketch', lambda: AmountSketch(index))
+
+    engine = QueryEngine(dataset, index=index, cube=cube, rollup=rollup)
+    key = engine.key()
+    narrow = engine.key(year_range=(2015, 2018), amount_range=(150, 2500))
+
+    stats = stage('filter_cube', lambda: cube.query(*key))
+    stage('filter_cube_narrow', lambda: cube.query(*narrow))
+    stage('estimate_narrow', lambda: sketch.query(*narrow))
+    selection = stage('filter_rows', lambda: index.select(*key))
+    stage('filter_rows_narrow', lambda: index.select(*narrow))
+    stage('concentration', lambda: stats.concentration())
+    stage('by_year_country', lambda: [(stats.by_year(i), stats.by_country(i)) for i in key[0]])
+    stage('periods_narrow', lambda: [rollup.query(*narrow).series(i, 'month') for i in narrow[0]])
+    stage('explorer_page', lambda: selection.page(PROJECT_COLUMNS, 0, 200))
+    trend_figure = app_trend_figure()
+    render_trends(trend_figure, key, stats)  # warm the per-language template, as a running app would
+    stage('render_trends', lambda: render_trends(trend_figure, key, stats))
+
+    # Best calibrate() from before and after the stages, so one busy moment doesn't skew the scale
+    reference = min(reference, measure(calibrate, max(repeat, 10), memory=False)[0])
+    print(f"  {'(calibrate)':<18} {reference:>10.4f}s", flush=True)
+    return {'rows': rows, 'reference': round(reference, 6), 'stages': results}
+
+
+def compare(current, baseline, tolerance, min_seconds):
+    """Regressions of current against baseline, as messages
+
+    Baseline timings are scaled up by how much slower this run's calibrate()
+    was than the baseline's (never down: a fast calibrate is often just luck).
+    """
+    failures = []
+    for size, run in current.items():
+        base = baseline.get(size)
+        if base is None:
+            continue
+        scale = 1.0
+        if run.get('reference') and base.get('reference'):
+            scale = max(run['reference'] / base['reference'], 1.0)
+        for name, now in run['stages'].items():
+            before = base['stages'].get(name)
+            if before is None or name in UNCHECKED:
+                continue
+            limit = before['seconds'] * scale * (1 + tolerance)
+            if now['seconds'] > max(limit, min_seconds):
+                failures.append(f"{size} {name}: {now['seconds']:.4f}s vs baseline {before['seconds']:.4f}s"
+                                f" (×{scale:.2f} for this machine)")
+            if now['peak_mb'] is not None and before.get('peak_mb') is not None:
+                if now['peak_mb'] > before['peak_mb'] * (1 + tolerance) + 1:
+                    failures.append(f"{size} {name}: {now['peak_mb']:.1f} MB vs baseline {before['peak_mb']:.1f} MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['2.4k', '100k'], choices=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run per stage')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes for the classify_parallel stage (1 skips it)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--check', action='store_true', help='fail on regressions against the baseline')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed slowdown / growth (0.3 = 30%%)')
+    parser.add_argument('--min-seconds', type=float, default=0.1, help='timings below this never fail (noise)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    current = {}
+    for size in args.sizes:
+        print(f"📦 {size}", flush=True)
+        current[size] = run_size(size, args.repeat, memory=not args.no_memory, workers=args.workers)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(current)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+
+    elif args.check:
+        if not os.path.exists(args.baseline):
+            print(f"❌ No baseline at {args.baseline}; record one with --save-baseline")
+            sys.exit(2)
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        failures = compare(current, baseline, args.tolerance, args.min_seconds)
+        if failures:
+            print('❌ Regressions:')
+            for message in failures:
+                print(f'  {message}')
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
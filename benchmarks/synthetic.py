@@ -0,0 +1,97 @@
+"""Synthetic tracker datasets with the schema of china_investment_tracker.csv
+
+Rows are drawn from the real file with a seeded generator: the deal text
+(Investor, Partner/Target, Sector, Subsector, Share Size, BRI) comes from one
+source row, Country/Region from another, Year and Month are drawn uniformly
+and the amount is a jittered source amount. Keyword hit rates and column
+cardinalities therefore stay close to the real data at any size.
+
+Usage: python benchmarks/synthetic.py 1m [--out tracker_1m.csv] [--seed 0]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, 'china_investment_tracker.csv')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+sys.path.insert(0, ROOT)
+
+from classifier import parse_millions  # noqa: E402
+
+# Named sizes; '2.4k' is the real file itself
+SIZES = {'2.4k': None, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+CHUNK_ROWS = 500_000
+
+COLUMNS = ['Year', 'Month', 'Investor', 'Millions', 'Share Size', 'Partner/Target',
+           'Sector', 'Subsector', 'Country', 'Region', 'BRI']
+DEAL_COLUMNS = ['Investor', 'Share Size', 'Partner/Target', 'Sector', 'Subsector', 'BRI']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+def _source():
+    """Real rows as raw strings (empty cells stay empty)"""
+    src = pd.read_csv(SOURCE, dtype=str, keep_default_na=False)
+    amounts = np.nan_to_num(parse_millions(src['Millions']))
+    return src, amounts
+
+
+def generate_chunks(rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """DataFrames of up to chunk_rows synthetic rows, rows in total"""
+    src, amounts = _source()
+    years = pd.to_numeric(src['Year']).to_numpy()
+    rng = np.random.default_rng(seed)
+
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        deal = rng.integers(len(src), size=n)
+        geo = rng.integers(len(src), size=n)
+        amount = np.round(amounts[rng.integers(len(src), size=n)] * rng.uniform(0.5, 1.5, size=n), -1)
+
+        chunk = pd.DataFrame({
+            'Year': rng.integers(years.min(), years.max() + 1, size=n),
+            'Month': np.asarray(MONTHS, dtype=object)[rng.integers(12, size=n)],
+            'Millions': [f'${int(v):,} ' for v in amount],
+        })
+        for col in DEAL_COLUMNS:
+            chunk[col] = src[col].to_numpy()[deal]
+        for col in ['Country', 'Region']:
+            chunk[col] = src[col].to_numpy()[geo]
+        yield chunk[COLUMNS]
+
+
+def write_csv(path, rows, seed=0):
+    """Write a synthetic tracker CSV chunk by chunk"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(generate_chunks(rows, seed)):
+            chunk.to_csv(f, index=False, header=i == 0)
+    os.replace(tmp, path)
+    return path
+
+
+def dataset_path(size, seed=0):
+    """CSV for a named size, generated once under benchmarks/.data"""
+    rows = SIZES[size]
+    if rows is None:
+        return SOURCE
+    path = os.path.join(DATA_DIR, f'tracker-{size}-seed{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        write_csv(path, rows, seed)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic tracker CSV')
+    parser.add_argument('size', choices=[s for s, rows in SIZES.items() if rows])
+    parser.add_argument('--out')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    path = write_csv(args.out, SIZES[args.size], args.seed) if args.out else dataset_path(args.size, args.seed)
+    print(f'✅ {SIZES[args.size]:,} rows → {path}')
@@ -0,0 +1,838 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import store
+
+DATA_FILE = 'china_investment_tracker.csv'
+CACHE_DIR = '.cache'
+
+logger = logging.getLogger('dashboard.store')
+
+# Industry definitions (corrected: coal is energy, not mineral; focus on metal minerals)
+INDUSTRY_KEYWORDS = {
+    'Integrated Circuits': ['semiconductor', 'chip', 'wafer', 'foundry', 'chipmaker', 'integrated circuit'],
+    'Biopharmaceuticals': ['pharma', 'biotech', 'drug', 'medicine', 'healthcare', 'medical', 'clinic', 'vaccine', 'therapeutic'],
+    'New Energy Vehicles': ['electric vehicle', 'ev ', 'battery', 'auto', 'automotive', 'vehicle'],
+    'Mineral Resources': ['mining', 'mineral', 'copper', 'lithium', 'iron ore', 'cobalt', 'nickel', 'zinc', 'rare earth', 'metal']  # Removed: coal (energy), gold/silver (precious metals)
+}
+
+EXCLUDE_PATTERNS = {
+    'Biopharmaceuticals': ['hospitality'],
+    'New Energy Vehicles': ['carlson', 'carmike', 'carrefour'],
+    'Mineral Resources': ['goldman', 'coal']  # Exclude coal (energy sector)
+}
+
+# 生成器脚本使用的中文行业表（generate_accurate_lists.py）- 更严格的匹配规则
+ACCURATE_INDUSTRY_KEYWORDS = {
+    '集成电路': ['semiconductor', 'chip', 'wafer', 'foundry', 'chipmaker', 'integrated circuit'],
+    '生物医药': ['pharma', 'biotech', 'drug', 'medicine', 'healthcare', 'medical', 'clinic', 'vaccine', 'therapeutic'],
+    '人工智能': ['artificial intelligence', 'machine learning', 'deep learning', 'neural network', 'computer vision'],
+    '新能源汽车': ['electric vehicle', 'ev ', 'battery', 'auto', 'automotive', 'vehicle'],
+    '矿产资源': ['mining', 'mineral', 'copper', 'lithium', 'iron ore', 'cobalt', 'nickel', 'zinc', 'gold', 'silver', 'coal', 'metal']
+}
+
+# 排除词列表（防止误匹配）
+ACCURATE_EXCLUDE_PATTERNS = {
+    '生物医药': ['hospitality'],  # 排除酒店业
+    '新能源汽车': ['carlson', 'carmike', 'carrefour'],  # 排除酒店、影院、超市
+    '矿产资源': ['goldman']  # 排除高盛（虽然包含gold）
+}
+
+# 旧版宽松关键词（generate_lists.py），无排除词
+LEGACY_INDUSTRY_KEYWORDS = {
+    '集成电路': ['semiconductor', 'chip', 'ic ', 'integrated circuit', 'wafer', 'foundry', 'chipmaker'],
+    '生物医药': ['pharma', 'biotech', 'drug', 'medicine', 'healthcare', 'medical', 'hospital', 'clinic', 'vaccine', 'therapeutic'],
+    '人工智能': ['ai', 'artificial intelligence', 'machine learning', 'deep learning', 'software'],
+    '新能源汽车': ['electric vehicle', 'ev ', 'battery', 'auto', 'automotive', 'car', 'vehicle', 'byd'],
+    '矿产资源': ['mining', 'mineral', 'copper', 'lithium', 'iron ore', 'cobalt', 'nickel', 'zinc', 'gold', 'silver', 'coal', 'metal']
+}
+
+# Columns concatenated (in this order) into the text that keywords are matched against
+TEXT_COLUMNS = ['Sector', 'Subsector', 'Partner/Target', 'Investor']
+
+# Column types on load: repetitive text (and the raw amounts, parsed once per distinct
+# value) as categoricals; Year is downcast to the smallest integer type after reading
+TRACKER_DTYPES = {col: 'category' for col in ['Month', 'Millions', 'Sector', 'Subsector', 'Country', 'Region', 'BRI']}
+# Rows per chunk of the out-of-core build (stream_dataset)
+STREAM_CHUNK_ROWS = 200_000
+
+
+def classify_accurate(row):
+    """Classify investment by industry"""
+    text = (str(row.get('Sector', '')) + ' ' +
+            str(row.get('Subsector', '')) + ' ' +
+            str(row.get('Partner/Target', '')) + ' ' +
+            str(row.get('Investor', ''))).lower()
+
+    matches = []
+
+    # Check if it matches any target industry
+    for industry, keywords in INDUSTRY_KEYWORDS.items():
+        should_exclude = False
+        if industry in EXCLUDE_PATTERNS:
+            for exclude_word in EXCLUDE_PATTERNS[industry]:
+                if exclude_word in text:
+                    should_exclude = True
+                    break
+
+        if should_exclude:
+            continue
+
+        for keyword in keywords:
+            if keyword in text:
+                matches.append(industry)
+                break
+
+    # If no match, use original Sector
+    if not matches:
+        sector = str(row.get('Sector', 'Other')).strip()
+        if sector and sector != 'nan' and sector != '':
+            matches.append(sector)
+        else:
+            matches.append('Other')
+
+    return matches
+
+
+def build_text(df, missing='nan'):
+    """Lower-cased match text per row, built exactly like classify_accurate does
+
+    Missing cells render as 'nan' for pandas rows; csv.DictReader rows had ''.
+    """
+    parts = []
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            parts.append(df[col].astype(object).fillna(missing).astype(str).tolist())
+        else:
+            parts.append([''] * len(df))
+    return [' '.join(values).lower() for values in zip(*parts)]
+
+
+def sector_fallback(df):
+    """Label used by classify_accurate for rows that match no target industry"""
+    if 'Sector' not in df.columns:
+        return np.full(len(df), 'Other', dtype=object)
+    sector = df['Sector'].astype(object)
+    sector = sector.where(sector.notna(), 'nan').map(str).str.strip()
+    sector = sector.where((sector != 'nan') & (sector != ''), 'Other')
+    return sector.to_numpy(dtype=object)
+
+
+class ClassificationResult:
+    """Vectorized output of KeywordClassifier.classify
+
+    membership[i, j] is True when row i belongs to industries[j]; keywords[i, j]
+    holds the keyword that matched (first in keyword-list order), else None.
+    Rows with no target industry fall back to their original Sector.
+    """
+
+    def __init__(self, industries, membership, keywords, fallback):
+        self.industries = list(industries)
+        self.membership = membership
+        self.keywords = keywords
+        self.fallback = fallback
+
+    def __len__(self):
+        return len(self.membership)
+
+    def take(self, rows):
+        """Result restricted to the given row positions"""
+        return ClassificationResult(self.industries, self.membership[rows], self.keywords[rows], self.fallback[rows])
+
+    def codes(self):
+        """Industry bitmask per row (bit j set when the row belongs to industries[j])"""
+        weights = np.left_shift(1, np.arange(len(self.industries), dtype=np.int64))
+        return self.membership.astype(np.int64) @ weights
+
+    def labels(self):
+        """Per-row industry lists, identical to df.apply(classify_accurate, axis=1)"""
+        names = self.industries
+        combos = {}
+        labels = []
+        for code, fallback in zip(self.codes().tolist(), self.fallback):
+            if not code:
+                labels.append([fallback])
+                continue
+            if code not in combos:
+                combos[code] = [name for j, name in enumerate(names) if code >> j & 1]
+            labels.append(list(combos[code]))
+        return labels
+
+
+class CodedArray:
+    """Read-only object array kept as integer codes into a lookup (code -1 = missing)
+
+    Indexing decodes only the selected cells, so a stored result's keywords and
+    fallback sectors stay memory-mapped codes instead of per-process object arrays.
+    """
+
+    def __init__(self, codes, values, missing=None):
+        self.codes = codes
+        self.lookup = np.array(list(values) + [missing], dtype=object)  # code -1 picks missing
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        return self.lookup[self.codes[key]]
+
+    def __iter__(self):
+        return iter(self.lookup[self.codes])
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.lookup[self.codes]
+        return values if dtype is None else values.astype(dtype)
+
+
+class KeywordClassifier:
+    """Keyword classifier compiled once for whole-column matching
+
+    All keywords and exclusion words are merged into one vocabulary. Rows are
+    joined into a single text blob and each word is located with C-level
+    substring search, jumping to the next row after a hit, so Python only runs
+    per matching row rather than per row and keyword. Membership and the
+    matched keyword are then plain NumPy reductions over the word matrix.
+    """
+
+    SEPARATOR = '\x00'
+
+    def __init__(self, industry_keywords=None, exclude_patterns=None, missing='nan'):
+        self.missing = missing
+        self.industry_keywords = dict(INDUSTRY_KEYWORDS if industry_keywords is None else industry_keywords)
+        self.exclude_patterns = dict(EXCLUDE_PATTERNS if exclude_patterns is None else exclude_patterns)
+        self.industries = list(self.industry_keywords)
+
+        vocab = []
+        for words in list(self.industry_keywords.values()) + list(self.exclude_patterns.values()):
+            for word in words:
+                if word not in vocab:
+                    vocab.append(word)
+        self.vocab = vocab
+        self._vocab = np.array(vocab, dtype=object)
+        word_id = {word: i for i, word in enumerate(vocab)}
+
+        # Word ids per industry (keyword list order preserved for Matched_Keyword)
+        self._keyword_ids = [np.array([word_id[w] for w in self.industry_keywords[ind]], dtype=np.intp)
+                             for ind in self.industries]
+        self._exclude_ids = [np.array([word_id[w] for w in self.exclude_patterns.get(ind, [])], dtype=np.intp)
+                             for ind in self.industries]
+
+    def scan(self, texts):
+        """Boolean matrix (rows x vocab) of which words occur in each text"""
+        texts = list(texts)
+        found = np.zeros((len(texts), len(self.vocab)), dtype=bool)
+        if not texts:
+            return found
+
+        sep = self.SEPARATOR
+        blob = sep.join(texts)
+        if blob.count(sep) != len(texts) - 1:
+            # A text contains the separator itself; blank it out so row offsets stay valid
+            blob = sep.join(t.replace(sep, ' ') for t in texts)
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        ends = np.cumsum(lengths + 1)
+
+        find = blob.find
+        for j, word in enumerate(self.vocab):
+            positions = []
+            start = find(word)
+            while start >= 0:
+                positions.append(start)
+                # Only the first hit per row matters: skip to the next row
+                start = find(sep, start)
+                if start < 0:
+                    break
+                start = find(word, start)
+            if positions:
+                rows = np.searchsorted(ends, np.asarray(positions), side='right')
+                found[rows, j] = True
+        return found
+
+    def match(self, found):
+        """Position of the matched keyword in each industry's list per row (-1: no match)"""
+        positions = np.full((len(found), len(self.industries)), -1, dtype=np.int16)
+        for j in range(len(self.industries)):
+            kw_found = found[:, self._keyword_ids[j]]
+            hit = kw_found.any(axis=1)
+            if len(self._exclude_ids[j]):
+                hit &= ~found[:, self._exclude_ids[j]].any(axis=1)
+            positions[hit, j] = kw_found.argmax(axis=1)[hit]
+        return positions
+
+    def result(self, positions, fallback):
+        """ClassificationResult from match() positions and the Sector fallbacks"""
+        membership = positions >= 0
+        keywords = np.full(positions.shape, None, dtype=object)
+        for j in range(len(self.industries)):
+            hit = membership[:, j]
+            keywords[hit, j] = self._vocab[self._keyword_ids[j][positions[hit, j]]]
+        return ClassificationResult(self.industries, membership, keywords, fallback)
+
+    def classify(self, df):
+        """Classify a whole frame at once, see ClassificationResult"""
+        return self.result(self.match(self.scan(build_text(df, self.missing))), sector_fallback(df))
+
+
+# Named keyword tables; every consumer classifies through the same engine
+RULESETS = {
+    'dashboard': KeywordClassifier(INDUSTRY_KEYWORDS, EXCLUDE_PATTERNS),
+    'accurate': KeywordClassifier(ACCURATE_INDUSTRY_KEYWORDS, ACCURATE_EXCLUDE_PATTERNS, missing=''),
+    'legacy': KeywordClassifier(LEGACY_INDUSTRY_KEYWORDS, {}, missing=''),
+}
+
+# Worker processes for classifying large frames (0 = one per core, 1 = serial); frames of
+# at least PARALLEL_MIN_ROWS rows are split into chunks of PARALLEL_CHUNK_ROWS rows
+CLASSIFY_WORKERS = int(os.environ.get('CLASSIFY_WORKERS', '1'))
+PARALLEL_MIN_ROWS = 200_000
+PARALLEL_CHUNK_ROWS = 100_000
+
+
+def _text_codes(df):
+    """TEXT_COLUMNS as an int32 code matrix (columns x rows, missing = -1) plus their categories as text"""
+    codes = np.zeros((len(TEXT_COLUMNS), len(df)), dtype=np.int32)
+    categories = []
+    for c, col in enumerate(TEXT_COLUMNS):
+        if col not in df.columns:
+            categories.append([''])  # build_text joins '' for absent columns
+            continue
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes[c], uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes[c], uniques = pd.factorize(values)
+        categories.append([str(v) for v in uniques])
+    return codes, categories
+
+
+def _share_text(df):
+    """TEXT_COLUMNS of df in one new shared memory block; returns (block, layout)
+
+    The block holds the code matrix of _text_codes, then int64 byte offsets of
+    every column's categories, then those categories as one UTF-8 blob, so
+    workers read only the strings their rows use. layout is (rows, categories
+    per column).
+    """
+    codes, categories = _text_codes(df)
+    encoded = [value.encode('utf-8') for values in categories for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    at = _offsets_at(codes.nbytes)
+    shm = shared_memory.SharedMemory(create=True, size=at + offsets.nbytes + int(offsets[-1]))
+    np.ndarray(codes.shape, dtype=np.int32, buffer=shm.buf)[:] = codes
+    np.ndarray(offsets.shape, dtype=np.int64, buffer=shm.buf, offset=at)[:] = offsets
+    shm.buf[at + offsets.nbytes:at + offsets.nbytes + int(offsets[-1])] = b''.join(encoded)
+    return shm, (len(df), [len(values) for values in categories])
+
+
+def _offsets_at(codes_nbytes):
+    return -(-codes_nbytes // 8) * 8
+
+
+_worker = {}
+
+
+def _attach(name):
+    """The shared block of the frame being classified, attached once per worker"""
+    if _worker.get('name') != name:
+        if 'shm' in _worker:
+            _worker.pop('shm').close()
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13: pool workers share the parent's resource tracker
+            shm = shared_memory.SharedMemory(name=name)
+        _worker.update(name=name, shm=shm)
+    return _worker['shm'].buf
+
+
+def _chunk_texts(buf, layout, start, stop):
+    """Per text column, its values for rows [start, stop) (None where missing)"""
+    rows, counts = layout
+    codes = np.ndarray((len(counts), rows), dtype=np.int32, buffer=buf)[:, start:stop].copy()
+    at = _offsets_at(len(counts) * rows * 4)
+    offsets = np.ndarray(sum(counts) + 1, dtype=np.int64, buffer=buf, offset=at)
+    blob = buf[at + offsets.nbytes:]
+    columns, base = [], 0
+    for column, count in zip(codes, counts):
+        used, inverse = np.unique(column, return_inverse=True)
+        values = np.array([None if code < 0 else
+                           str(blob[offsets[base + code]:offsets[base + code + 1]], 'utf-8') for code in used],
+                          dtype=object)
+        columns.append(values[inverse.reshape(-1)])
+        base += count
+    blob.release()
+    return columns
+
+
+def _classify_chunk(task):
+    """match() positions per ruleset for rows [start, stop) of a frame shared by _share_text"""
+    name, layout, rulesets, start, stop = task
+    columns = _chunk_texts(_attach(name), layout, start, stop)
+
+    texts, positions = {}, {}
+    for ruleset in rulesets:
+        clf = RULESETS[ruleset]
+        if clf.missing not in texts:
+            parts = [np.where(pd.isna(values), clf.missing, values) for values in columns]
+            texts[clf.missing] = [' '.join(values).lower() for values in zip(*parts)]
+        positions[ruleset] = clf.match(clf.scan(texts[clf.missing]))
+    return positions
+
+
+@contextlib.contextmanager
+def classifier_pool(workers=None):
+    """Worker processes for classify_all, started once for many frames (None when serial)
+
+    Used by stream_dataset so that each chunk of a large file doesn't start
+    and tear down a pool of its own.
+    """
+    workers = _workers(workers)
+    if workers <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield pool
+
+
+def _workers(workers):
+    workers = CLASSIFY_WORKERS if workers is None else workers
+    return workers or os.cpu_count() or 1
+
+
+def classify_parallel(df, rulesets=None, workers=None, chunk_rows=PARALLEL_CHUNK_ROWS, pool=None):
+    """{ruleset: ClassificationResult} for df, classified in chunks by a process pool
+
+    The text columns are shared once as dictionary codes in shared memory,
+    with their categories as one encoded blob; each chunk comes back as
+    compact keyword positions (see KeywordClassifier.match), in chunk order,
+    so the results are identical to classify(df). pool (see classifier_pool)
+    is used instead of starting one.
+    """
+    names = list(RULESETS) if rulesets is None else list(rulesets)
+    workers = max(1, workers or os.cpu_count() or 1)
+    chunk_rows = max(1, min(chunk_rows, -(-len(df) // workers)))
+    bounds = [(start, min(start + chunk_rows, len(df))) for start in range(0, len(df), chunk_rows)]
+
+    shm, layout = _share_text(df)
+    try:
+        tasks = [(shm.name, layout, names, start, stop) for start, stop in bounds]
+        if pool is not None:
+            chunks = list(pool.map(_classify_chunk, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(bounds)))) as own:
+                chunks = list(own.map(_classify_chunk, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    fallback = sector_fallback(df)
+    results = {}
+    for name in names:
+        clf = RULESETS[name]
+        positions = [chunk[name] for chunk in chunks] or [np.full((0, len(clf.industries)), -1, dtype=np.int16)]
+        results[name] = clf.result(np.concatenate(positions), fallback)
+    return results
+
+
+def classify_all(df, workers=None, pool=None):
+    """{ruleset: ClassificationResult} for df; large frames are split across CLASSIFY_WORKERS processes
+
+    With a running pool (classifier_pool), any frame above PARALLEL_CHUNK_ROWS
+    rows is split, since there are no processes to start.
+    """
+    workers = _workers(workers)
+    min_rows = PARALLEL_CHUNK_ROWS + 1 if pool is not None else PARALLEL_MIN_ROWS
+    if workers > 1 and len(df) >= min_rows:
+        return classify_parallel(df, workers=workers, pool=pool)
+    return {name: clf.classify(df) for name, clf in RULESETS.items()}
+
+
+_AMOUNT_JUNK = str.maketrans('', '', '$,')
+
+
+def parse_amount(text):
+    """A Millions cell ('$1,740 ') as a float, NaN when it holds no number"""
+    try:
+        return float(str(text).translate(_AMOUNT_JUNK))
+    except ValueError:
+        return float('nan')
+
+
+def parse_millions(values):
+    """Float array of a Millions column, parsing each distinct value once"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    parsed = np.array([parse_amount(v) for v in uniques] + [np.nan], dtype=np.float64)
+    return parsed[codes]  # missing cells have code -1, the trailing NaN
+
+
+def _whole(amount):
+    """Whether amounts have no gaps and no fractions (pd.to_numeric would have made them integers)"""
+    return not np.isnan(amount).any() and np.array_equal(amount, np.floor(amount))
+
+
+def _clean(df):
+    if 'Year' in df.columns:
+        df['Year'] = pd.to_numeric(df['Year'], downcast='integer')
+    df['Amount'] = parse_millions(df['Millions'])
+    return df
+
+
+def load_tracker(path=DATA_FILE):
+    """Read the tracker CSV with the typed schema and parse Millions into Amount"""
+    df = _clean(pd.read_csv(path, dtype=TRACKER_DTYPES))
+    if _whole(df['Amount'].to_numpy()):
+        df['Amount'] = df['Amount'].astype(np.int64)
+    return df
+
+
+def read_tracker_chunks(path=DATA_FILE, chunk_rows=STREAM_CHUNK_ROWS):
+    """load_tracker in frames of up to chunk_rows rows (Amount always float)
+
+    Text columns are read as text in every chunk, so a chunk whose cells of a
+    column are all empty keeps the column's type.
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    dtype = {col: TRACKER_DTYPES.get(col, str) for col in columns if col != 'Year'}
+    for df in pd.read_csv(path, dtype=dtype, chunksize=chunk_rows):
+        yield _clean(df)
+
+
+class ClassifiedDataset:
+    """Tracker rows plus one ClassificationResult per ruleset (rows aligned)
+
+    directory is the on-disk store it lives in; its name (version) identifies
+    the source content and keyword tables.
+    """
+
+    def __init__(self, df, results, directory=None, fingerprints=None):
+        self.df = df
+        self.results = results
+        self.directory = directory
+        self.version = os.path.basename(directory) if directory else None
+        self.fingerprints = row_fingerprints(df) if fingerprints is None else fingerprints
+
+    def industry_rows(self, ruleset, industry):
+        """Row positions and matched keywords for one industry of a ruleset"""
+        result = self.results[ruleset]
+        j = result.industries.index(industry)
+        rows = np.flatnonzero(result.membership[:, j])
+        return rows, result.keywords[rows, j]
+
+
+# Column layout of the per-industry project lists
+EXPORT_FIELDS = ['Year', 'Month', 'Investor', 'Amount_USD_Million', 'Partner_Target',
+                 'Country', 'Region', 'Sector', 'Subsector', 'BRI', 'Matched_Keyword']
+
+
+def _cell(value):
+    """CSV text of a cell as it appeared in the source file"""
+    if pd.isna(value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def export_records(dataset, ruleset, industry):
+    """One industry's projects in EXPORT_FIELDS layout, largest amount first"""
+    rows, keywords = dataset.industry_rows(ruleset, industry)
+    df = dataset.df
+    amounts = df['Amount'].fillna(0).to_numpy()[rows]
+    order = np.argsort(-amounts, kind='stable')
+    columns = {col: df[col].to_numpy()[rows] for col in
+               ['Year', 'Month', 'Investor', 'Partner/Target', 'Country', 'Region', 'Sector', 'Subsector', 'BRI']}
+
+    records = []
+    for i in order:
+        records.append({
+            'Year': _cell(columns['Year'][i]),
+            'Month': _cell(columns['Month'][i]),
+            'Investor': _cell(columns['Investor'][i]),
+            'Amount_USD_Million': float(amounts[i]),
+            'Partner_Target': _cell(columns['Partner/Target'][i]),
+            'Country': _cell(columns['Country'][i]),
+            'Region': _cell(columns['Region'][i]),
+            'Sector': _cell(columns['Sector'][i]),
+            'Subsector': _cell(columns['Subsector'][i]),
+            'BRI': _cell(columns['BRI'][i]),
+            'Matched_Keyword': keywords[i]
+        })
+    return records
+
+
+def keyword_version():
+    """Short hash of every ruleset's keyword tables and the load schema; changes invalidate the store"""
+    tables = {name: [clf.industry_keywords, clf.exclude_patterns, clf.missing] for name, clf in RULESETS.items()}
+    tables['schema'] = TRACKER_DTYPES
+    return hashlib.sha256(json.dumps(tables, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def row_fingerprints(df):
+    """64-bit hash of each row's source columns (Amount is derived, so left out)"""
+    columns = [c for c in df.columns if c != 'Amount']
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def _result_arrays(name, result, vocab, fallback=None):
+    """ClassificationResult as plain numpy arrays for the columnar store
+
+    fallback: a store.StringEncoder shared by all chunks of a streamed build.
+    """
+    word_id = {word: i for i, word in enumerate(vocab)}
+    keyword_codes = np.full(result.keywords.shape, -1, dtype=np.int16)
+    hit = result.membership
+    keyword_codes[hit] = [word_id[w] for w in result.keywords[hit]]
+    if fallback is None:
+        fallback_codes, fallback_categories = store.encode_strings(result.fallback)
+    else:
+        fallback_codes, fallback_categories = fallback.encode(result.fallback), fallback.categories
+    arrays = {
+        f'{name}.membership': result.membership,
+        f'{name}.keywords': keyword_codes,
+        f'{name}.fallback': fallback_codes,
+    }
+    return arrays, {'industries': result.industries, 'vocab': list(vocab), 'fallback': fallback_categories}
+
+
+def _result_from_arrays(name, arrays, meta):
+    keywords = CodedArray(arrays[f'{name}.keywords'], meta['vocab'])
+    fallback = CodedArray(arrays[f'{name}.fallback'], meta['fallback'], missing=np.nan)
+    return ClassificationResult(meta['industries'], np.asarray(arrays[f'{name}.membership']), keywords, fallback)
+
+
+_memory_cache = {}
+_hash_memo = {}
+
+
+def _source_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _cache_parent(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+
+
+def store_dir(path=DATA_FILE):
+    """Store location for this file's content and the current keyword tables"""
+    key = _source_key(path)
+    if key not in _hash_memo:
+        _hash_memo[key] = store.content_hash(path)
+    return os.path.join(_cache_parent(path), f'classified-{_hash_memo[key][:16]}-{keyword_version()}')
+
+
+def save_dataset(dataset, directory):
+    arrays, meta = {'fingerprints': dataset.fingerprints}, {'rulesets': {}}
+    for name, result in dataset.results.items():
+        result_arrays, result_meta = _result_arrays(name, result, RULESETS[name].vocab)
+        arrays.update(result_arrays)
+        meta['rulesets'][name] = result_meta
+    store.save(directory, dataset.df, arrays, meta)
+
+
+def load_dataset(directory):
+    df, arrays, meta = store.load(directory)
+    results = {name: _result_from_arrays(name, arrays, result_meta)
+               for name, result_meta in meta['rulesets'].items()}
+    return ClassifiedDataset(df, results, directory=directory,
+                             fingerprints=np.asarray(arrays['fingerprints']) if 'fingerprints' in arrays else None)
+
+
+def _latest_file(path):
+    return os.path.join(_cache_parent(path), 'latest.json')
+
+
+def _read_latest(latest_file):
+    """{source path: store name} from latest.json ({} if missing or unreadable)"""
+    try:
+        with open(latest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def mark_latest(path, directory):
+    """Remember directory as the newest store built from path (latest.json is replaced, never rewritten in place)"""
+    latest_file = _latest_file(path)
+    latest = _read_latest(latest_file)
+    latest[os.path.abspath(path)] = os.path.basename(directory)
+    fd, tmp = tempfile.mkstemp(prefix='.latest-', suffix='.json', dir=os.path.dirname(latest_file))
+    try:
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(latest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, latest_file)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _persist(path, dataset):
+    """Write dataset's store and mark it latest
+
+    If the cache directory can't be written (read-only, disk full, ...), the
+    dataset stays in memory only: its directory is cleared, so nothing else is
+    saved next to it either.
+    """
+    try:
+        save_dataset(dataset, dataset.directory)
+    except OSError as e:
+        logger.warning('store %s not saved, keeping it in memory: %s', dataset.version, e)
+        dataset.directory = None
+        return
+    try:
+        mark_latest(path, dataset.directory)
+    except OSError as e:
+        logger.warning('store %s saved but not marked latest: %s', dataset.version, e)
+
+
+def latest_store(path=DATA_FILE):
+    """Newest store built from path with the current keyword tables, or None"""
+    name = _read_latest(_latest_file(path)).get(os.path.abspath(path))
+    directory = os.path.join(_cache_parent(path), name) if name else None
+    if directory and name.endswith('-' + keyword_version()) and store.exists(directory):
+        return directory
+    return None
+
+
+def classify_incremental(df, previous, workers=None):
+    """Results for df that reuse previous's labels for unchanged rows
+
+    Rows are matched on row_fingerprints, so appended, edited and reordered
+    rows are all handled; only rows without a match are classified.
+    Returns (results, fingerprints, classified_rows).
+    """
+    fingerprints = row_fingerprints(df)
+    known, first = np.unique(previous.fingerprints, return_index=True)
+    pos = np.minimum(np.searchsorted(known, fingerprints), max(len(known) - 1, 0))
+    matched = (known[pos] == fingerprints) if len(known) else np.zeros(len(df), dtype=bool)
+    old_rows = first[pos[matched]]
+    new_rows = np.flatnonzero(~matched)
+
+    results = {}
+    fresh_results = classify_all(df.iloc[new_rows], workers)
+    for name, clf in RULESETS.items():
+        old = previous.results[name]
+        fresh = fresh_results[name]
+        membership = np.zeros((len(df), len(clf.industries)), dtype=bool)
+        keywords = np.full(membership.shape, None, dtype=object)
+        fallback = np.empty(len(df), dtype=object)
+        membership[matched] = old.membership[old_rows]
+        keywords[matched] = old.keywords[old_rows]
+        fallback[matched] = old.fallback[old_rows]
+        membership[new_rows] = fresh.membership
+        keywords[new_rows] = fresh.keywords
+        fallback[new_rows] = fresh.fallback
+        results[name] = ClassificationResult(clf.industries, membership, keywords, fallback)
+    return results, fingerprints, new_rows
+
+
+def build_dataset(path=DATA_FILE, workers=None):
+    """Load the CSV and classify it once for every ruleset, writing the store (see _persist)"""
+    df = load_tracker(path)
+    directory = store_dir(path)
+    dataset = ClassifiedDataset(df, classify_all(df, workers), directory=directory)
+    _persist(path, dataset)
+    _memory_cache[_source_key(path)] = dataset
+    return dataset
+
+
+def stream_dataset(path=DATA_FILE, chunk_rows=STREAM_CHUNK_ROWS, workers=None, on_chunk=None):
+    """build_dataset for files larger than memory: read, classify and store chunk by chunk
+
+    Peak memory depends on chunk_rows and the distinct strings per column, not
+    on the row count. on_chunk(df, results) is called with every classified
+    chunk, e.g. to aggregate it. Classification workers are started once for
+    the whole file. The store is written but not loaded; returns (directory, rows).
+    """
+    directory = store_dir(path)
+    encoders = {name: store.StringEncoder() for name in RULESETS}
+    meta, whole = {'rulesets': {}}, True
+    with store.StoreWriter(directory) as writer, classifier_pool(workers) as pool:
+        for df in read_tracker_chunks(path, chunk_rows):
+            results = classify_all(df, workers, pool)
+            arrays = {'fingerprints': row_fingerprints(df)}
+            for name, result in results.items():
+                result_arrays, meta['rulesets'][name] = _result_arrays(name, result, RULESETS[name].vocab,
+                                                                       encoders[name])
+                arrays.update(result_arrays)
+            writer.append(df, arrays)
+            whole = whole and _whole(df['Amount'].to_numpy())
+            if on_chunk is not None:
+                on_chunk(df, results)
+        if not meta['rulesets']:
+            raise ValueError(f'{path} has no rows')
+        if whole:
+            writer.recast('Amount', np.int64)
+        writer.finish(meta)
+    mark_latest(path, directory)
+    return directory, writer.rows
+
+
+def update_dataset(path, previous, workers=None):
+    """Store for path built from a previous ClassifiedDataset, classifying only new rows
+
+    Returns (dataset, classified_rows).
+    """
+    df = load_tracker(path)
+    results, fingerprints, classified_rows = classify_incremental(df, previous, workers)
+    directory = store_dir(path)
+    dataset = ClassifiedDataset(df, results, directory=directory, fingerprints=fingerprints)
+    _persist(path, dataset)
+    _memory_cache[_source_key(path)] = dataset
+    return dataset, classified_rows
+
+
+def classify_dataset(path=DATA_FILE):
+    """Classified dataset, from memory, then the on-disk store, else built now"""
+    key = _source_key(path)
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    directory = store_dir(path)
+    if store.exists(directory):
+        try:
+            dataset = load_dataset(directory)
+        except (OSError, ValueError, KeyError):
+            dataset = None
+        if dataset is not None and set(dataset.results) == set(RULESETS):
+            _memory_cache[key] = dataset
+            return dataset
+
+    # New release of a file seen before: only classify the rows that changed
+    previous = latest_store(path)
+    if previous is not None:
+        try:
+            return update_dataset(path, load_dataset(previous))[0]
+        except (OSError, ValueError, KeyError):
+            pass
+    return build_dataset(path)
+
+
+if __name__ == '__main__':
+    # Nightly batch: python classifier.py [tracker.csv]  (CLASSIFY_WORKERS=0 classifies on every core)
+    source = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    dataset = build_dataset(source)
+    directory = store_dir(source)
+    # Older stores (previous data releases or keyword tables) are no longer needed
+    store.prune(_cache_parent(source), 'classified-', keep={os.path.basename(directory)})
+    print(f"✅ {len(dataset.df):,} rows classified → {directory}")
+    for name, result in dataset.results.items():
+        counts = result.membership.sum(axis=0)
+        summary = ', '.join(f"{ind}: {int(c)}" for ind, c in zip(result.industries, counts))
+        print(f"  {name}: {summary}")
@@ -0,0 +1,416 @@
+"""Precomputed aggregate cube: industry × amount bucket × country × year
+
+Each cell holds count, sum and sum of squares of Amount over the (row,
+industry) pairs that fall in it. Sidebar filters are answered by slicing the
+cube and reducing it, instead of rescanning rows. Amount buckets that the
+selected range only partly covers are resolved exactly from the few pairs in
+those buckets, so results always equal a full scan.
+"""
+import numpy as np
+import pandas as pd
+
+import store
+
+# Bucket edges in million USD; multiples of 100 so the sidebar's step-100 bounds
+# (and the 0 / 50,000 defaults) usually fall on an edge
+AMOUNT_EDGES = np.array([0, 100, 200, 300, 500, 1000, 2000, 5000, 10000, 20000, 50000], dtype=np.float64)
+
+
+class AggregateCube:
+    """Count/sum/sum-of-squares cube over an IndustryIndex"""
+
+    def __init__(self, index, version=None, totals=None, pairs=None):
+        self.index = index
+        self.version = version
+        self.years = index.year_values
+        self.n_industries = len(index.industries)
+        self.n_buckets = len(AMOUNT_EDGES) + 1
+        self.n_countries = len(index.countries) + 1  # last slot: missing Country
+
+        if totals is not None and pairs is not None:
+            # Loaded by load(): nothing to aggregate or sort
+            self.count, self.total, self.sumsq = totals
+            self.pair_ids, self.pair_amounts, self.bucket_offsets = pairs
+            return
+
+        amounts = index.amounts[index.pair_rows]
+        valid = ~np.isnan(amounts)
+        pair_ids = np.flatnonzero(valid)  # NaN amounts never pass the amount filter
+        buckets = self.bucket_of(amounts[pair_ids])
+
+        # Pairs sorted by amount (so also grouped by bucket): a partly covered
+        # bucket resolves to an interval of it with searchsorted
+        self.pair_ids = pair_ids[np.argsort(amounts[pair_ids], kind='stable')]
+        self.pair_amounts = amounts[self.pair_ids]
+        self.bucket_offsets = np.zeros(self.n_buckets + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=self.n_buckets), out=self.bucket_offsets[1:])
+
+        if totals is not None:
+            self.count, self.total, self.sumsq = totals
+            return
+
+        cells = self._cells(pair_ids, buckets)
+        shape = self.shape
+        size = int(np.prod(shape))
+        values = amounts[pair_ids]
+        self.count = np.bincount(cells, minlength=size).reshape(shape)
+        self.total = np.bincount(cells, weights=values, minlength=size).reshape(shape)
+        self.sumsq = np.bincount(cells, weights=values * values, minlength=size).reshape(shape)
+
+    @property
+    def shape(self):
+        return (self.n_industries, self.n_buckets, self.n_countries, len(self.years))
+
+    def axes(self):
+        """Axis labels (the last country slot is the missing Country)"""
+        return self._axes_for(self.index)
+
+    def save(self, directory):
+        store.save(directory, pd.DataFrame(),
+                   {'count': self.count, 'total': self.total, 'sumsq': self.sumsq, 'pair_ids': self.pair_ids,
+                    'pair_amounts': self.pair_amounts, 'bucket_offsets': self.bucket_offsets},
+                   self.axes())
+
+    @classmethod
+    def load(cls, directory, index, version=None):
+        """Cube saved for this index's axes, or None (see store.load_matching)
+
+        Cubes saved without their pair arrays (older stores, CubeAccumulator)
+        get them recomputed from the index.
+        """
+        arrays = store.load_matching(directory, cls._axes_for(index))
+        if arrays is None:
+            return None
+        pairs = None
+        if 'pair_ids' in arrays:
+            pairs = (arrays['pair_ids'], arrays['pair_amounts'], arrays['bucket_offsets'])
+        return cls(index, version, totals=(arrays['count'], arrays['total'], arrays['sumsq']), pairs=pairs)
+
+    @staticmethod
+    def _axes_for(index):
+        """JSON-able axis labels of the cube an index would produce"""
+        return {
+            'industries': list(index.industries),
+            'countries': list(index.countries),
+            'years': [int(y) for y in index.year_values],
+            'edges': AMOUNT_EDGES.tolist(),
+        }
+
+    @classmethod
+    def updated(cls, previous, index, version, changes):
+        """Cube for index from a previous cube's totals plus row deltas
+
+        previous is (axes, (count, total, sumsq)) as saved by save(); changes is
+        a list of (IndustryIndex, weights), one weight per base row of that
+        index (+n for rows added n times, -n for removed ones). Only the changed
+        rows are aggregated.
+        """
+        axes, totals = previous
+        new_axes = cls._axes_for(index)
+        industries = new_axes['industries'] + [i for i in axes['industries'] if i not in set(new_axes['industries'])]
+        countries = new_axes['countries'] + [c for c in axes['countries'] if c not in set(new_axes['countries'])]
+        years = new_axes['years'] + [y for y in axes['years'] if y not in set(new_axes['years'])]
+        n_buckets = len(AMOUNT_EDGES) + 1
+        shape = (len(industries), n_buckets, len(countries) + 1, len(years))
+        size = int(np.prod(shape))
+
+        ind_pos = {name: i for i, name in enumerate(industries)}
+        country_pos = {name: i for i, name in enumerate(countries)}
+        year_pos = {y: i for i, y in enumerate(years)}
+
+        # Previous totals placed into the union of old and new axes
+        old_i = np.array([ind_pos[i] for i in axes['industries']], dtype=np.intp)
+        old_c = np.array([country_pos[c] for c in axes['countries']] + [len(countries)], dtype=np.intp)
+        old_y = np.array([year_pos[y] for y in axes['years']], dtype=np.intp)
+        merged = []
+        for array in totals:
+            union = np.zeros(shape, dtype=np.float64)
+            union[np.ix_(old_i, np.arange(n_buckets), old_c, old_y)] = array
+            merged.append(union.reshape(-1))
+
+        for delta_index, weights in changes:
+            cells, pair_weights, values = cls._delta_cells(delta_index, weights, ind_pos, country_pos, year_pos)
+            merged[0] += np.bincount(cells, weights=pair_weights, minlength=size)
+            merged[1] += np.bincount(cells, weights=pair_weights * values, minlength=size)
+            merged[2] += np.bincount(cells, weights=pair_weights * values * values, minlength=size)
+
+        # Back to the new index's axes (old-only labels have no rows left)
+        keep_c = np.append(np.arange(len(new_axes['countries'])), len(countries))
+        sliced = [m.reshape(shape)[:len(new_axes['industries'])][:, :, keep_c][:, :, :, :len(new_axes['years'])]
+                  for m in merged]
+        count = np.rint(sliced[0]).astype(np.int64)
+        return cls(index, version, totals=(count, sliced[1], sliced[2]))
+
+    @classmethod
+    def _delta_cells(cls, index, weights, ind_pos, country_pos, year_pos):
+        """(flat cell, weight, amount) of an index's pairs on the axes numbered by the *_pos maps
+
+        weights holds one weight per base row; pairs of weight 0 or without an
+        amount are left out. The missing Country is the slot after all countries.
+        """
+        pair_weights = np.repeat(np.asarray(weights, dtype=np.float64), np.diff(index.indptr))
+        amounts = index.amounts[index.pair_rows]
+        valid = ~np.isnan(amounts) & (pair_weights != 0)
+        rows = index.pair_rows[valid]
+        values, pair_weights = amounts[valid], pair_weights[valid]
+
+        n_buckets, n_countries, n_years = len(AMOUNT_EDGES) + 1, len(country_pos) + 1, len(year_pos)
+        i = np.array([ind_pos[n] for n in index.industries], dtype=np.int64)[index.codes[valid]]
+        c_lookup = np.array([country_pos[n] for n in index.countries] + [n_countries - 1], dtype=np.int64)
+        c = c_lookup[index.country_codes[rows]]  # code -1 picks the missing slot
+        year_values, year_codes = np.unique(index.years[rows], return_inverse=True)
+        y = np.array([year_pos[int(v)] for v in year_values], dtype=np.int64)[year_codes.reshape(-1)]
+        b = cls.bucket_of(values)
+        cells = ((i * n_buckets + b) * n_countries + c) * n_years + y
+        return cells, pair_weights, values
+
+    @staticmethod
+    def bucket_of(amounts):
+        """Bucket i covers [AMOUNT_EDGES[i - 1], AMOUNT_EDGES[i])"""
+        return np.searchsorted(AMOUNT_EDGES, amounts, side='right')
+
+    def bucket_bounds(self, bucket):
+        lo = AMOUNT_EDGES[bucket - 1] if bucket > 0 else -np.inf
+        hi = AMOUNT_EDGES[bucket] if bucket < len(AMOUNT_EDGES) else np.inf
+        return lo, hi
+
+    def _countries(self, pairs):
+        codes = self.index.country_codes[self.index.pair_rows[pairs]]
+        return np.where(codes < 0, self.n_countries - 1, codes)
+
+    def _years(self, pairs):
+        return np.searchsorted(self.years, self.index.years[self.index.pair_rows[pairs]])
+
+    def _cells(self, pairs, buckets):
+        codes = self.index.codes[pairs].astype(np.int64)
+        return ((codes * self.n_buckets + buckets) * self.n_countries + self._countries(pairs)) \
+            * len(self.years) + self._years(pairs)
+
+    def query(self, industries, year_range=None, amount_range=None, countries=None):
+        """Aggregates for the sidebar filters, as a CubeSlice"""
+        known = dict.fromkeys(i for i in industries if i in self.index._code)
+        codes = np.array([self.index.code(i) for i in known], dtype=np.intp)
+
+        year_mask = np.ones(len(self.years), dtype=bool)
+        if year_range is not None:
+            year_mask = (self.years >= year_range[0]) & (self.years <= year_range[1])
+
+        country_mask = self.index.country_mask(countries)
+
+        lo, hi = (-np.inf, np.inf) if amount_range is None else amount_range
+        full, partial = [], []
+        for b in range(self.n_buckets):
+            b_lo, b_hi = self.bucket_bounds(b)
+            if b_lo >= lo and b_hi <= hi:
+                full.append(b)
+            elif b_hi > lo and b_lo <= hi:
+                partial.append(b)
+
+        def reduce(cube):
+            return cube[codes][:, full].sum(axis=1)[:, :, year_mask][:, country_mask]
+
+        count, total, sumsq = reduce(self.count), reduce(self.total), reduce(self.sumsq)
+
+        if partial and len(codes):
+            spans = []
+            for b in partial:
+                start, end = self.bucket_offsets[b], self.bucket_offsets[b + 1]
+                first = start + np.searchsorted(self.pair_amounts[start:end], lo, side='left')
+                last = start + np.searchsorted(self.pair_amounts[start:end], hi, side='right')
+                spans.append(np.sort(self.pair_ids[first:last]))
+            pairs = np.concatenate(spans)
+            values = self.index.amounts[self.index.pair_rows[pairs]]
+            selected = np.zeros(self.n_industries, dtype=np.intp) - 1
+            selected[codes] = np.arange(len(codes))
+            keep = selected[self.index.codes[pairs]] >= 0
+            c_idx, y_idx = self._countries(pairs), self._years(pairs)
+            keep &= country_mask[c_idx] & year_mask[y_idx]
+
+            # Positions of countries/years within the sliced axes
+            c_pos = np.cumsum(country_mask) - 1
+            y_pos = np.cumsum(year_mask) - 1
+            pairs, values = pairs[keep], values[keep]
+            i = selected[self.index.codes[pairs]]
+            c, y = c_pos[c_idx[keep]], y_pos[y_idx[keep]]
+            np.add.at(count, (i, c, y), 1)
+            np.add.at(total, (i, c, y), values)
+            np.add.at(sumsq, (i, c, y), values * values)
+
+        slice_countries = np.append(np.asarray(self.index.countries, dtype=object), None)[country_mask]
+        return CubeSlice([self.index.industries[c] for c in codes], slice_countries,
+                         self.years[year_mask], count, total, sumsq)
+
+
+class CubeAccumulator:
+    """Cube totals summed chunk by chunk, for building a cube out of core
+
+    add() aggregates one chunk's IndustryIndex; the axes grow as industries,
+    countries and years appear and are sorted on save, so the saved cube is
+    the one AggregateCube would build over a single index of all chunks.
+    """
+
+    def __init__(self):
+        self.industries, self.countries, self.years = [], [], []
+        self._positions = ({}, {}, {})
+        self.totals = [np.zeros((0, len(AMOUNT_EDGES) + 1, 1, 0)) for _ in range(3)]
+
+    def add(self, index):
+        labels = (index.industries, index.countries, [int(y) for y in index.year_values])
+        for axis, positions, new in zip((self.industries, self.countries, self.years), self._positions, labels):
+            for label in new:
+                if label not in positions:
+                    positions[label] = len(axis)
+                    axis.append(label)
+        shape = (len(self.industries), len(AMOUNT_EDGES) + 1, len(self.countries) + 1, len(self.years))
+        if shape != self.totals[0].shape:
+            n_i, _, n_c, n_y = self.totals[0].shape
+            grown = []
+            for array in self.totals:
+                union = np.zeros(shape)
+                union[:n_i, :, :n_c - 1, :n_y] = array[:, :, :-1]
+                union[:n_i, :, -1, :n_y] = array[:, :, -1]  # the missing-Country slot stays last
+                grown.append(union)
+            self.totals = grown
+
+        cells, weights, values = AggregateCube._delta_cells(index, np.ones(len(index.base)), *self._positions)
+        size = int(np.prod(shape))
+        for array, w in zip(self.totals, (weights, weights * values, weights * values * values)):
+            array.reshape(-1)[:] += np.bincount(cells, weights=w, minlength=size)
+
+    def axes(self):
+        return {
+            'industries': sorted(self.industries),
+            'countries': sorted(self.countries),
+            'years': sorted(self.years),
+            'edges': AMOUNT_EDGES.tolist(),
+        }
+
+    def save(self, directory):
+        """Write the cube in AggregateCube.save's layout"""
+        axes = self.axes()
+        i = [self._positions[0][name] for name in axes['industries']]
+        c = [self._positions[1][name] for name in axes['countries']] + [len(self.countries)]
+        y = [self._positions[2][year] for year in axes['years']]
+        count, total, sumsq = (array[np.ix_(i, np.arange(len(AMOUNT_EDGES) + 1), c, y)] for array in self.totals)
+        store.save(directory, pd.DataFrame(), {'count': np.rint(count).astype(np.int64), 'total': total,
+                                               'sumsq': sumsq}, axes)
+
+
+class CubeSlice:
+    """Reduced cube for one filter state: arrays shaped industry × country × year
+
+    Offers the aggregate half of Selection's interface (counts, sums, means,
+    per-industry year and country breakdowns).
+    """
+
+    def __init__(self, industries, countries, years, count, total, sumsq):
+        self.industries = industries
+        self.countries = countries
+        self.years = years
+        self.count = count
+        self.total = total
+        self.sumsq = sumsq
+        self._position = {name: i for i, name in enumerate(industries)}
+
+    def __len__(self):
+        return int(self.count.sum())
+
+    def total_amount(self):
+        return float(self.total.sum())
+
+    def mean_amount(self):
+        n = self.count.sum()
+        return float(self.total.sum() / n) if n else float('nan')
+
+    def std_amount(self):
+        """Population standard deviation of Amount"""
+        n = self.count.sum()
+        if not n:
+            return float('nan')
+        mean = self.total.sum() / n
+        return float(np.sqrt(max(self.sumsq.sum() / n - mean * mean, 0.0)))
+
+    def country_count(self):
+        present = self.count.sum(axis=(0, 2)) > 0
+        named = np.array([c is not None for c in self.countries], dtype=bool)
+        return int((present & named).sum())
+
+    def by_year(self, industry):
+        """Year, Total_Investment, Project_Count for one industry"""
+        i = self._position.get(industry)
+        if i is None:
+            return pd.DataFrame({'Year': [], 'Total_Investment': [], 'Project_Count': []})
+        counts = self.count[i].sum(axis=0)
+        present = counts > 0
+        return pd.DataFrame({
+            'Year': self.years[present],
+            'Total_Investment': self.total[i].sum(axis=0)[present],
+            'Project_Count': counts[present],
+        })
+
+    def by_country(self, industry):
+        """Country, Total_Investment, Project_Count for one industry, largest first"""
+        i = self._position.get(industry)
+        if i is None:
+            return pd.DataFrame({'Country': [], 'Total_Investment': [], 'Project_Count': []})
+        counts = self.count[i].sum(axis=1)
+        named = np.array([c is not None for c in self.countries], dtype=bool)
+        present = (counts > 0) & named
+        stats = pd.DataFrame({
+            'Country': self.countries[present],
+            'Total_Investment': self.total[i].sum(axis=1)[present],
+            'Project_Count': counts[present],
+        })
+        return stats.sort_values('Total_Investment', ascending=False, kind='stable').reset_index(drop=True)
+
+    def concentration(self):
+        """Concentration statistics for every industry in one pass"""
+        return Concentration(self)
+
+
+class Concentration:
+    """HHI, top-3 share, country count and top destinations for all industries
+
+    Works on the industry × country pivot of a CubeSlice with NumPy reductions
+    instead of one groupby and sort per industry. Projects without a Country
+    count towards totals but not towards the country statistics.
+    """
+
+    def __init__(self, cube_slice):
+        self.industries = list(cube_slice.industries)
+        self.countries = np.asarray(cube_slice.countries, dtype=object)
+        totals = cube_slice.total.sum(axis=2)
+        counts = cube_slice.count.sum(axis=2)
+        named = np.array([c is not None for c in self.countries], dtype=bool)
+
+        present = (counts > 0) & named
+        self.country_totals = np.where(named, totals, 0.0)
+        country_sum = self.country_totals.sum(axis=1)
+        shares = np.divide(self.country_totals * 100, country_sum[:, None],
+                           out=np.zeros_like(self.country_totals), where=country_sum[:, None] > 0)
+
+        # Countries per industry by amount, largest first (absent countries last)
+        key = np.where(present, self.country_totals, -np.inf)
+        self.order = np.argsort(-key, axis=1, kind='stable')
+        self.num_countries = present.sum(axis=1)
+
+        top = self.order[:, 0] if self.countries.size else np.zeros(len(self.industries), dtype=np.intp)
+        has_country = self.num_countries > 0
+        top_destination = np.full(len(self.industries), None, dtype=object)
+        top_destination[has_country] = self.countries[top[has_country]]
+
+        self.frame = pd.DataFrame({
+            'Total_Investment': totals.sum(axis=1),
+            'Project_Count': counts.sum(axis=1),
+            'Country_Total': country_sum,
+            'HHI_Index': (shares ** 2).sum(axis=1),
+            'Top3_Share_%': np.take_along_axis(shares, self.order[:, :3], axis=1).sum(axis=1),
+            'Num_Countries': self.num_countries,
+            'Top_Destination': top_destination,
+        }, index=pd.Index(self.industries, name='Industry'))
+
+    def top(self, industry, k=None):
+        """Amount per destination for one industry, largest first"""
+        i = self.industries.index(industry)
+        order = self.order[i, :self.num_countries[i]][:k]
+        return pd.Series(self.country_totals[i, order], index=self.countries[order])
@@ -0,0 +1,181 @@
+"""Headless query engine: the dashboard's filters and metrics without Streamlit
+
+Holds one classified dataset with its industry index, aggregate cube, monthly
+rollup, amount sketches (for approximate metrics) and a shared filter cache. Filter states are canonical keys (see
+filter_key), so the Streamlit app, the HTTP API and any other caller hit the
+same cached results.
+All methods are safe to call from several threads at once.
+"""
+import threading
+
+from classifier import DATA_FILE, INDUSTRY_KEYWORDS, classify_dataset
+from cube import AggregateCube
+from filter_cache import LRUCache, filter_key
+from industry_index import IndustryIndex, compact_frame
+from ingest import CUBE_DIR, INDEX_DIR, ROLLUP_DIR, SKETCH_DIR, artifact_dir
+from rollup import PeriodRollup
+from sketch import AmountSketch
+
+# Dashboard defaults: target industries plus the most frequent other sectors, all
+# years, projects up to 50,000 million USD
+DEFAULT_OTHER_SECTORS = 10
+DEFAULT_AMOUNT_RANGE = (0, 50000)
+
+# Columns of the Data Explorer / projects listing
+PROJECT_COLUMNS = ['Year', 'Month', 'Industries', 'Investor', 'Amount',
+                   'Partner/Target', 'Country', 'Region', 'Sector', 'Subsector']
+
+
+def _load_or_build(dataset, name, load, build):
+    """load(directory) of a structure in the dataset's store, else build() (and save it there once)
+
+    Datasets kept in memory only (no directory) always build.
+    """
+    directory = None if dataset.directory is None else artifact_dir(dataset, name)
+    built = None if directory is None else load(directory)
+    if built is None:
+        built = build()
+        if directory is not None:
+            try:
+                built.save(directory)
+            except OSError:
+                pass
+    return built
+
+
+def load_index(dataset):
+    """Dashboard industry index of a dataset"""
+    return _load_or_build(dataset, INDEX_DIR,
+                          lambda directory: IndustryIndex.load(directory, compact_frame(dataset.df)),
+                          lambda: IndustryIndex.from_result(dataset.df, dataset.results['dashboard']))
+
+
+def load_cube(dataset, index):
+    """Aggregate cube of a dataset"""
+    return _load_or_build(dataset, CUBE_DIR, lambda directory: AggregateCube.load(directory, index, dataset.version),
+                          lambda: AggregateCube(index, dataset.version))
+
+
+def load_rollup(dataset, index):
+    """Monthly rollup of a dataset"""
+    return _load_or_build(dataset, ROLLUP_DIR, lambda directory: PeriodRollup.load(directory, index),
+                          lambda: PeriodRollup(index))
+
+
+def load_sketch(dataset, index):
+    """Amount sketches of a dataset"""
+    return _load_or_build(dataset, SKETCH_DIR, lambda directory: AmountSketch.load(directory, index),
+                          lambda: AmountSketch(index))
+
+
+class QueryEngine:
+    """Dashboard computations over one classified dataset"""
+
+    def __init__(self, dataset, cache_size=256, ttl=3600, index=None, cube=None, rollup=None):
+        self.dataset = dataset
+        self.version = dataset.version
+        self.result = dataset.results['dashboard']
+        self.index = load_index(dataset) if index is None else index
+        self.cube = load_cube(dataset, self.index) if cube is None else cube
+        self.cache = LRUCache(maxsize=cache_size, ttl=ttl, name='engine')
+        self._rollup = rollup
+        self._sketch = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path=DATA_FILE, **kwargs):
+        return cls(classify_dataset(path), **kwargs)
+
+    @property
+    def industries(self):
+        return self.index.industries
+
+    @property
+    def target_industries(self):
+        return list(INDUSTRY_KEYWORDS.keys())
+
+    def other_sectors(self):
+        """Non-target industries with projects, most frequent first"""
+        targets = set(self.target_industries)
+        counts = self.index.industry_counts()
+        return [s for s in counts.index if s not in targets and counts[s] > 0]
+
+    def default_industries(self):
+        return self.target_industries + self.other_sectors()[:DEFAULT_OTHER_SECTORS]
+
+    def year_bounds(self):
+        years = self.index.years
+        return int(years.min()), int(years.max())
+
+    def countries(self):
+        return sorted(self.index.countries)
+
+    def key(self, industries=None, year_range=None, amount_range=None, countries=None):
+        """Canonical filter key; unset filters take the dashboard defaults"""
+        return filter_key(
+            self.default_industries() if industries is None else industries,
+            self.year_bounds() if year_range is None else year_range,
+            DEFAULT_AMOUNT_RANGE if amount_range is None else amount_range,
+            countries,
+        )
+
+    def stats(self, key):
+        """Aggregates for a filter key, as a CubeSlice"""
+        return self.cache.get_or_compute(('stats', key), lambda: self.cube.query(*key))
+
+    @property
+    def rollup(self):
+        """Monthly rollup for the month / quarter views (loaded on first use)"""
+        with self._lock:
+            if self._rollup is None:
+                self._rollup = load_rollup(self.dataset, self.index)
+        return self._rollup
+
+    @property
+    def sketch(self):
+        """Amount sketches for approximate metrics (loaded on first use)"""
+        with self._lock:
+            if self._sketch is None:
+                self._sketch = load_sketch(self.dataset, self.index)
+        return self._sketch
+
+    def estimate(self, key):
+        """Approximate aggregates for a filter key from the sketches, as a SketchSlice"""
+        return self.cache.get_or_compute(('estimate', key), lambda: self.sketch.query(*key))
+
+    def concentration(self, key):
+        """HHI / top-3 share / destinations for every selected industry"""
+        return self.cache.get_or_compute(('concentration', key), lambda: self.stats(key).concentration())
+
+    def periods(self, key):
+        """Monthly totals for a filter key, as a PeriodSlice (month / quarter series, rolling sums, YoY)"""
+        return self.cache.get_or_compute(('periods', key), lambda: self.rollup.query(*key))
+
+    def selection(self, key):
+        """Matching (row, industry) pairs, for listings and exports"""
+        return self.cache.get_or_compute(('rows', key), lambda: self.index.select(*key))
+
+    def overview(self, key, approximate=False):
+        """The overview metrics: projects, total and average amount, countries
+
+        approximate=True answers from the amount sketches (counts exact, amounts
+        within sketch.ALPHA) and adds the median and 90th percentile amount.
+        """
+        if approximate:
+            estimate = self.estimate(key)
+            return {
+                'projects': len(estimate),
+                'total_investment': estimate.total_amount(),
+                'avg_investment': estimate.mean_amount(),
+                'countries': estimate.country_count(),
+                'median_investment': estimate.quantile(0.5),
+                'p90_investment': estimate.quantile(0.9),
+                'approximate': True,
+            }
+        stats = self.stats(key)
+        return {
+            'projects': len(stats),
+            'total_investment': stats.total_amount(),
+            'avg_investment': stats.mean_amount(),
+            'countries': stats.country_count(),
+        }
@@ -0,0 +1,117 @@
+"""Chunked CSV / Parquet export of a filtered selection
+
+Rows are produced CHUNK_SIZE pairs at a time in the selection's amount order,
+so the whole result is never converted to a frame at once. api.py streams
+the encoded chunks, so its memory is bounded by a chunk; the app's download
+button needs the finished file, which Streamlit keeps in memory to serve.
+Columns follow the project lists' EXPORT_FIELDS (as in
+generate_accurate_lists.py), preceded by the industry of each (row, industry)
+pair since the filtered view spans several industries.
+"""
+import importlib.util
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from classifier import EXPORT_FIELDS
+
+EXPORT_COLUMNS = ['Industry'] + EXPORT_FIELDS
+CHUNK_SIZE = 10000
+# Exports larger than this spill from memory to a temporary file
+SPOOL_SIZE = 16 << 20
+
+# Source column behind each export column (Amount and Matched_Keyword are derived)
+SOURCE_COLUMNS = {'Year': 'Year', 'Month': 'Month', 'Investor': 'Investor', 'Partner_Target': 'Partner/Target',
+                  'Country': 'Country', 'Region': 'Region', 'Sector': 'Sector', 'Subsector': 'Subsector',
+                  'BRI': 'BRI'}
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _column(values):
+    """Values as written to the lists: whole floats as integers, NaN as empty"""
+    if values.dtype.kind == 'f':
+        finite = values[~np.isnan(values)]
+        if np.array_equal(finite, np.floor(finite)):
+            return pd.array(values, dtype='Int64')
+        return values
+    if values.dtype.kind in 'iub':
+        return values
+    return pd.array(values, dtype=object)
+
+
+def export_frames(selection, result, industry_labels=None, chunk_size=CHUNK_SIZE):
+    """EXPORT_COLUMNS frames of up to chunk_size pairs, largest amount first
+
+    result is the ClassificationResult the selection's index was built from;
+    it supplies the matched keyword of each pair (empty for Sector fallbacks).
+    """
+    index = selection.index
+    base = index.base
+    labels = np.asarray(index.industries if industry_labels is None else industry_labels, dtype=object)
+    target = {name: j for j, name in enumerate(result.industries)}
+    keyword_column = np.array([target.get(name, -1) for name in index.industries], dtype=np.intp)
+
+    order = selection.by_amount()
+    for start in range(0, len(order), chunk_size):
+        pairs = order[start:start + chunk_size]
+        rows = index.pair_rows[pairs]
+        codes = index.codes[pairs]
+        columns = keyword_column[codes]
+        keywords = result.keywords[rows, np.maximum(columns, 0)]
+        keywords = np.where(columns >= 0, keywords, None)
+
+        data = {'Industry': labels[codes]}
+        for field in EXPORT_FIELDS:
+            if field == 'Amount_USD_Million':
+                data[field] = np.nan_to_num(index.amounts[rows].astype(np.float64))
+            elif field == 'Matched_Keyword':
+                data[field] = pd.array(keywords, dtype=object)
+            else:
+                data[field] = _column(base[SOURCE_COLUMNS[field]].iloc[rows].to_numpy())
+        yield pd.DataFrame(data, columns=EXPORT_COLUMNS)
+
+
+def iter_csv(selection, result, industry_labels=None, chunk_size=CHUNK_SIZE):
+    """UTF-8 (with BOM, like the project lists) CSV bytes, one chunk at a time"""
+    header = True
+    for frame in export_frames(selection, result, industry_labels, chunk_size):
+        text = frame.to_csv(index=False, header=header, lineterminator='\r\n')
+        yield (('\ufeff' if header else '') + text).encode('utf-8')
+        header = False
+    if header:
+        yield ('\ufeff' + ','.join(EXPORT_COLUMNS) + '\r\n').encode('utf-8')
+
+
+def write_csv(f, selection, result, industry_labels=None, chunk_size=CHUNK_SIZE):
+    for chunk in iter_csv(selection, result, industry_labels, chunk_size):
+        f.write(chunk)
+
+
+def write_parquet(f, selection, result, industry_labels=None, chunk_size=CHUNK_SIZE):
+    """Parquet with one row group per chunk (needs pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.string()) for name in EXPORT_COLUMNS])
+    schema = schema.set(schema.get_field_index('Year'), pa.field('Year', pa.int64()))
+    schema = schema.set(schema.get_field_index('Amount_USD_Million'), pa.field('Amount_USD_Million', pa.float64()))
+    schema = schema.set(schema.get_field_index('BRI'), pa.field('BRI', pa.int64()))
+
+    with pq.ParquetWriter(f, schema) as writer:
+        for frame in export_frames(selection, result, industry_labels, chunk_size):
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+
+def export_file(selection, result, fmt='csv', industry_labels=None, max_size=SPOOL_SIZE):
+    """Export into a rewound temporary file (in memory up to max_size bytes, then on disk)"""
+    f = tempfile.SpooledTemporaryFile(max_size=max_size)
+    if fmt == 'parquet':
+        write_parquet(f, selection, result, industry_labels)
+    else:
+        write_csv(f, selection, result, industry_labels)
+    f.seek(0)
+    return f
@@ -0,0 +1,109 @@
+"""Bounded LRU/TTL memo of filter results, shared by all sessions
+
+Entries are keyed on the canonical sidebar state (see filter_key), so the
+default view and popular combinations are computed once and then served to
+every session. Concurrent misses on one key are computed once: other callers
+wait for that result. Hit/miss/eviction counters are kept for sizing, and every
+lookup is reported to LRUCache.observer (name, hit) when one is installed
+(see instrument.py).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def filter_key(industries, year_range=None, amount_range=None, countries=None):
+    """Canonical, hashable form of the sidebar filter state"""
+    return (
+        tuple(sorted(set(industries))),
+        None if year_range is None else (int(year_range[0]), int(year_range[1])),
+        None if amount_range is None else (float(amount_range[0]), float(amount_range[1])),
+        tuple(sorted(set(countries or ()))),
+    )
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry"""
+
+    observer = None
+
+    def __init__(self, maxsize=256, ttl=None, name=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._pending = {}  # key -> Event set when its compute in progress finishes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            hit = entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl)
+            if hit:
+                self._data.move_to_end(key)
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+        if self.observer is not None:
+            self.observer(self.name, hit)
+        return entry[1] if hit else default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing (outside the lock) and storing it on a miss
+
+        While one caller computes a key, others asking for it wait and get the
+        same result; if that compute fails, the next waiter computes instead.
+        """
+        missing = object()
+        while True:
+            value = self.get(key, missing)
+            if value is not missing:
+                return value
+            with self._lock:
+                done = self._pending.get(key)
+                if done is None and key not in self._data:
+                    done = self._pending[key] = threading.Event()
+                    break
+            if done is not None:
+                done.wait()
+        try:
+            value = compute()
+            self.put(key, value)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            done.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -1,78 +1,22 @@
 import csv
 
+from classifier import ACCURATE_INDUSTRY_KEYWORDS, EXPORT_FIELDS, classify_dataset, export_records
+
 print("="*80)
 print("生成更准确的行业分类（去除虚高）")
 print("="*80)
 
-# 读取数据
-with open('china_investment_tracker.csv', 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    data = list(reader)
-
-# 重新定义关键词 - 更严格的匹配规则
-industry_keywords = {
-    '集成电路': ['semiconductor', 'chip', 'wafer', 'foundry', 'chipmaker', 'integrated circuit'],
-    '生物医药': ['pharma', 'biotech', 'drug', 'medicine', 'healthcare', 'medical', 'clinic', 'vaccine', 'therapeutic'],
-    '人工智能': ['artificial intelligence', 'machine learning', 'deep learning', 'neural network', 'computer vision'],
-    '新能源汽车': ['electric vehicle', 'ev ', 'battery', 'auto', 'automotive', 'vehicle'],
-    '矿产资源': ['mining', 'mineral', 'copper', 'lithium', 'iron ore', 'cobalt', 'nickel', 'zinc', 'gold', 'silver', 'coal', 'metal']
-}
-
-# 排除词列表（防止误匹配）
-exclude_patterns = {
-    '生物医药': ['hospitality'],  # 排除酒店业
-    '新能源汽车': ['carlson', 'carmike', 'carrefour'],  # 排除酒店、影院、超市
-    '矿产资源': ['goldman']  # 排除高盛（虽然包含gold）
-}
-
-def classify_accurate(row):
-    text = (str(row.get('Sector', '')) + ' ' + 
-            str(row.get('Subsector', '')) + ' ' + 
-            str(row.get('Partner/Target', '')) + ' ' + 
-            str(row.get('Investor', ''))).lower()
-    
-    matches = {}
-    
-    for industry, keywords in industry_keywords.items():
-        # 检查排除词
-        should_exclude = False
-        if industry in exclude_patterns:
-            for exclude_word in exclude_patterns[industry]:
-                if exclude_word in text:
-                    should_exclude = True
-                    break
-        
-        if should_exclude:
-            continue
-        
-        # 检查关键词
-        for keyword in keywords:
-            if keyword in text:
-                matches[industry] = keyword
-                break
-    
-    return matches
+# 读取共享分类结果（classifier.py，按文件缓存，只分类一次）
+dataset = classify_dataset()
+industry_keywords = ACCURATE_INDUSTRY_KEYWORDS
 
 # 统计新的分类结果
 print("\n第一步：统计各行业项目数（新分类）")
 print("-"*80)
 
-industry_counts = {industry: 0 for industry in industry_keywords.keys()}
-industry_projects = {industry: [] for industry in industry_keywords.keys()}
-
-for row in data:
-    matches = classify_accurate(row)
-    for industry in matches:
-        industry_counts[industry] += 1
-        try:
-            amount = float(row['Millions'].replace('$', '').replace(',', '').strip())
-        except:
-            amount = 0
-        industry_projects[industry].append({
-            'row': row,
-            'amount': amount,
-            'keyword': matches[industry]
-        })
+industry_projects = {industry: export_records(dataset, 'accurate', industry)
+                     for industry in industry_keywords.keys()}
+industry_counts = {industry: len(projects) for industry, projects in industry_projects.items()}
 
 print("\n对比结果：")
 print(f"{'行业':<12} {'旧分类':<10} {'新分类':<10} {'减少':<10} {'说明'}")
@@ -108,30 +52,13 @@ print("-"*80)
 for industry in industry_keywords.keys():
     filename = f'准确清单_{industry}.csv'
     
-    # 按金额排序
-    projects = sorted(industry_projects[industry], key=lambda x: x['amount'], reverse=True)
+    # 已按金额排序
+    projects = industry_projects[industry]
     
     with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        fieldnames = ['Year', 'Month', 'Investor', 'Amount_USD_Million', 'Partner_Target', 
-                     'Country', 'Region', 'Sector', 'Subsector', 'BRI', 'Matched_Keyword']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
         writer.writeheader()
-        
-        for project in projects:
-            row = project['row']
-            writer.writerow({
-                'Year': row['Year'],
-                'Month': row['Month'],
-                'Investor': row['Investor'],
-                'Amount_USD_Million': project['amount'],
-                'Partner_Target': row['Partner/Target'],
-                'Country': row['Country'],
-                'Region': row['Region'],
-                'Sector': row['Sector'],
-                'Subsector': row['Subsector'],
-                'BRI': row['BRI'],
-                'Matched_Keyword': project['keyword']
-            })
+        writer.writerows(projects)
     
     print(f"✅ {industry}: {len(projects)} 个项目 → {filename}")
 
@@ -140,18 +67,17 @@ print("\n\n第三步：展示各行业Top 10项目（验证准确性）")
 print("="*80)
 
 for industry in industry_keywords.keys():
-    projects = sorted(industry_projects[industry], key=lambda x: x['amount'], reverse=True)[:10]
+    projects = industry_projects[industry][:10]
     
     print(f"\n【{industry}】- Top 10")
     print("-"*70)
     
-    for idx, project in enumerate(projects, 1):
-        row = project['row']
-        print(f"{idx:2d}. ${project['amount']:>8,.0f}M | {row['Year']} | {row['Country']:<20}")
+    for idx, row in enumerate(projects, 1):
+        print(f"{idx:2d}. ${row['Amount_USD_Million']:>8,.0f}M | {row['Year']} | {row['Country']:<20}")
         print(f"    投资方: {row['Investor'][:50]}")
-        print(f"    目标方: {row['Partner/Target'][:50]}")
+        print(f"    目标方: {row['Partner_Target'][:50]}")
         print(f"    原始行业: {row['Sector']}/{row['Subsector']}")
-        print(f"    ✓ 匹配: '{project['keyword']}'")
+        print(f"    ✓ 匹配: '{row['Matched_Keyword']}'")
         print()
 
 print("\n" + "="*80)
@@ -1,74 +1,133 @@
+import argparse
 import csv
+import heapq
+from itertools import islice
 
-# 读取数据
-with open('china_investment_tracker.csv', 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    data = list(reader)
-
-# 定义关键词
-industry_keywords = {
-    '集成电路': ['semiconductor', 'chip', 'ic ', 'integrated circuit', 'wafer', 'foundry', 'chipmaker'],
-    '生物医药': ['pharma', 'biotech', 'drug', 'medicine', 'healthcare', 'medical', 'hospital', 'clinic', 'vaccine', 'therapeutic'],
-    '人工智能': ['ai', 'artificial intelligence', 'machine learning', 'deep learning', 'software'],
-    '新能源汽车': ['electric vehicle', 'ev ', 'battery', 'auto', 'automotive', 'car', 'vehicle', 'byd'],
-    '矿产资源': ['mining', 'mineral', 'copper', 'lithium', 'iron ore', 'cobalt', 'nickel', 'zinc', 'gold', 'silver', 'coal', 'metal']
-}
-
-def classify_and_explain(row):
-    text = (str(row.get('Sector', '')) + ' ' + 
-            str(row.get('Subsector', '')) + ' ' + 
-            str(row.get('Partner/Target', '')) + ' ' + 
-            str(row.get('Investor', ''))).lower()
-    
-    matches = {}
-    for industry, keywords in industry_keywords.items():
-        for keyword in keywords:
-            if keyword in text:
-                matches[industry] = keyword
-                break
-    return matches
-
-# 为每个行业生成CSV
-for industry in industry_keywords.keys():
-    filename = f'项目清单_{industry}.csv'
-    
-    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        fieldnames = ['Year', 'Month', 'Investor', 'Amount_USD_Million', 'Partner_Target', 
-                     'Country', 'Region', 'Sector', 'Subsector', 'BRI', 'Matched_Keyword']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # 收集该行业的所有项目
-        projects = []
-        for row in data:
-            matches = classify_and_explain(row)
-            if industry in matches:
-                try:
-                    amount = float(row['Millions'].replace('$', '').replace(',', '').strip())
-                except:
-                    amount = 0
-                
-                projects.append({
-                    'Year': row['Year'],
-                    'Month': row['Month'],
-                    'Investor': row['Investor'],
-                    'Amount_USD_Million': amount,
-                    'Partner_Target': row['Partner/Target'],
-                    'Country': row['Country'],
-                    'Region': row['Region'],
-                    'Sector': row['Sector'],
-                    'Subsector': row['Subsector'],
-                    'BRI': row['BRI'],
-                    'Matched_Keyword': matches[industry]
-                })
-        
-        # 按金额排序
-        projects.sort(key=lambda x: x['Amount_USD_Million'], reverse=True)
-        
-        # 写入文件
-        for project in projects:
-            writer.writerow(project)
-    
-    print(f"✅ {industry}: {len(projects)} 个项目 → {filename}")
-
-print("\n✅ 所有CSV文件已生成！")
+import numpy as np
+import pandas as pd
+
+from classifier import DATA_FILE, LEGACY_INDUSTRY_KEYWORDS, EXPORT_FIELDS, RULESETS, classify_dataset, export_records, parse_amount
+
+FILE_PREFIX = {'legacy': '项目清单', 'accurate': '准确清单'}
+
+
+def export_cached():
+    """全量导出：读取共享分类结果（classifier.py，按文件缓存，只分类一次）"""
+    dataset = classify_dataset()
+
+    # 为每个行业生成CSV
+    for industry in LEGACY_INDUSTRY_KEYWORDS.keys():
+        filename = f'项目清单_{industry}.csv'
+
+        with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+
+            # 该行业的所有项目（已按金额排序）
+            projects = export_records(dataset, 'legacy', industry)
+
+            # 写入文件
+            for project in projects:
+                writer.writerow(project)
+
+        print(f"✅ {industry}: {len(projects)} 个项目 → {filename}")
+
+
+def export_streaming(path=DATA_FILE, ruleset='legacy', top_n=None, batch_size=50000):
+    """单遍流式导出：逐批读取CSV，每行只分类一次，同时分发到所有行业
+
+    top_n 为空时按原始顺序直接写出；否则每个行业用大小为 top_n 的堆保留金额最大的项目，
+    结果与全量排序后取前 top_n 相同（金额相同按原始顺序）。
+    """
+    classifier = RULESETS[ruleset]
+    industries = classifier.industries
+    prefix = FILE_PREFIX.get(ruleset, ruleset)
+
+    files, writers = {}, {}
+    for industry in industries:
+        filename = f'{prefix}_{industry}.csv'
+        files[industry] = open(filename, 'w', encoding='utf-8-sig', newline='')
+        writers[industry] = csv.DictWriter(files[industry], fieldnames=EXPORT_FIELDS)
+        writers[industry].writeheader()
+    heaps = {industry: [] for industry in industries}
+    counts = dict.fromkeys(industries, 0)
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            seq = 0
+            while True:
+                batch = list(islice(reader, batch_size))
+                if not batch:
+                    break
+                result = classifier.classify(pd.DataFrame.from_records(batch, columns=reader.fieldnames))
+
+                for i, j in zip(*np.nonzero(result.membership)):
+                    row = batch[i]
+                    industry = industries[j]
+                    amount = parse_amount(row['Millions'])
+                    if amount != amount:  # 非数字金额记为 0
+                        amount = 0
+                    project = {
+                        'Year': row['Year'],
+                        'Month': row['Month'],
+                        'Investor': row['Investor'],
+                        'Amount_USD_Million': amount,
+                        'Partner_Target': row['Partner/Target'],
+                        'Country': row['Country'],
+                        'Region': row['Region'],
+                        'Sector': row['Sector'],
+                        'Subsector': row['Subsector'],
+                        'BRI': row['BRI'],
+                        'Matched_Keyword': result.keywords[i, j]
+                    }
+                    counts[industry] += 1
+
+                    if top_n is None:
+                        writers[industry].writerow(project)
+                        continue
+                    # 最小堆：堆顶是当前保留项目中金额最小（同额时最靠后）的一个
+                    item = (amount, -(seq + i), project)
+                    if top_n <= 0:  # 不保留任何项目
+                        continue
+                    if len(heaps[industry]) < top_n:
+                        heapq.heappush(heaps[industry], item)
+                    elif item[:2] > heaps[industry][0][:2]:
+                        heapq.heapreplace(heaps[industry], item)
+                seq += len(batch)
+
+        if top_n is not None:
+            for industry in industries:
+                for _, _, project in sorted(heaps[industry], key=lambda x: x[:2], reverse=True):
+                    writers[industry].writerow(project)
+    finally:
+        for f in files.values():
+            f.close()
+
+    for industry in industries:
+        kept = counts[industry] if top_n is None else min(counts[industry], max(top_n, 0))
+        print(f"✅ {industry}: {counts[industry]} 个项目，写出 {kept} 个 → {prefix}_{industry}.csv")
+
+
+def positive_int(value):
+    """argparse 类型：至少为 1 的整数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'必须是正整数：{value}')
+    return number
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成各行业项目清单CSV')
+    parser.add_argument('--stream', action='store_true', help='单遍流式导出（适用于超大数据文件）')
+    parser.add_argument('--csv', default=DATA_FILE, help='数据文件（仅 --stream）')
+    parser.add_argument('--ruleset', default='legacy', choices=sorted(FILE_PREFIX), help='关键词规则（仅 --stream）')
+    parser.add_argument('--top', type=positive_int, default=None, help='每个行业只保留金额最大的N个项目（仅 --stream）')
+    args = parser.parse_args()
+
+    if args.stream:
+        export_streaming(args.csv, args.ruleset, args.top)
+    else:
+        export_cached()
+
+    print("\n✅ 所有CSV文件已生成！")
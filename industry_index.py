@@ -0,0 +1,278 @@
+"""Compact row→industry index over the classified base table
+
+Instead of df.explode('Industries'), which copies every row once per industry,
+the base table is kept once (categorical-coded) and membership is stored CSR
+style: indptr[i]:indptr[i + 1] slices the industry codes of row i. Each
+(row, industry) pair is one "project" in the dashboard's counts and sums.
+
+Year and Amount also get secondary indexes (row ids sorted by value), so range
+filters resolve to an interval with searchsorted instead of a full-column scan.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import store
+
+# String columns with few distinct values relative to the row count
+CATEGORY_COLUMNS = ['Month', 'Investor', 'Sector', 'Subsector', 'Country', 'Region']
+
+# Arrays persisted by IndustryIndex.save (everything derived from the base table)
+INDEX_ARRAYS = ['indptr', 'codes', 'pair_rows', 'years', 'amounts', 'country_codes', 'year_order',
+                'year_values', 'year_offsets', 'amount_order', 'sorted_amounts', 'pairs_by_amount']
+
+
+def compact_frame(df):
+    """Shallow copy of df with repetitive string columns stored as categoricals (used categories only)
+
+    Columns that are already categoricals without unused categories (e.g. a
+    memory-mapped store) are kept as they are, not copied.
+    """
+    df = df.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes = df[col].cat.codes.to_numpy()
+            used = np.bincount(codes[codes >= 0], minlength=len(df[col].cat.categories))
+            if not used.all():
+                df[col] = df[col].cat.remove_unused_categories()
+        else:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _codes(values):
+    """Integer codes (NaN -> -1) and categories of a column"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int32), list(values.cat.categories)
+    codes, categories = pd.factorize(values, sort=True)
+    return codes.astype(np.int32), list(categories)
+
+
+class IndustryIndex:
+    """Base table plus CSR row→industry membership"""
+
+    def __init__(self, base, industries, indptr, codes, arrays=None):
+        self.base = base
+        self.industries = list(industries)
+        self.indptr = indptr
+        self.codes = codes
+        self._code = {name: i for i, name in enumerate(self.industries)}
+        if arrays is not None:
+            # Loaded by load(): every derived array is already computed
+            for name in INDEX_ARRAYS:
+                setattr(self, name, arrays[name])
+            self.countries = list(base['Country'].cat.categories)
+            return
+
+        self.pair_rows = np.repeat(np.arange(len(base), dtype=np.int32), np.diff(indptr))
+
+        self.years = base['Year'].to_numpy()
+        self.amounts = base['Amount'].to_numpy(dtype=np.float64)
+        self.country_codes, self.countries = _codes(base['Country'])
+
+        # Secondary indexes: rows sorted by Year (with an offset per distinct
+        # year) and by Amount (NaN sorts last and never falls inside a range)
+        self.year_order = np.argsort(self.years, kind='stable')
+        self.year_values, self.year_offsets = np.unique(self.years[self.year_order], return_index=True)
+        self.year_offsets = np.append(self.year_offsets, len(base))
+        self.amount_order = np.argsort(self.amounts, kind='stable')
+        self.sorted_amounts = self.amounts[self.amount_order]
+
+    @classmethod
+    def from_result(cls, df, result):
+        """Build from a ClassificationResult (target industries, else the Sector fallback)"""
+        base = compact_frame(df)
+        n = len(base)
+        hit_rows, hit_cols = np.nonzero(result.membership)
+        miss_rows = np.flatnonzero(~result.membership.any(axis=1))
+        fallback = np.asarray(result.fallback[miss_rows], dtype=object)
+
+        industries = sorted(set(np.asarray(result.industries)[np.unique(hit_cols)]) | set(fallback))
+        code = {name: i for i, name in enumerate(industries)}
+        target_codes = np.array([code.get(name, -1) for name in result.industries], dtype=np.int32)
+
+        rows = np.concatenate([hit_rows, miss_rows])
+        codes = np.concatenate([target_codes[hit_cols],
+                                np.array([code[name] for name in fallback], dtype=np.int32)])
+        # Row order, then the row's own industry order (same as explode)
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return cls(base, industries, indptr, codes[order].astype(np.int32))
+
+    def save(self, directory):
+        store.save(directory, pd.DataFrame(), {name: getattr(self, name) for name in INDEX_ARRAYS},
+                   {'industries': self.industries, 'countries': list(self.countries), 'rows': len(self.base)})
+
+    @classmethod
+    def load(cls, directory, base):
+        """Index saved for a compact_frame base table, or None (as in store.load_matching)"""
+        if not store.exists(directory):
+            return None
+        _, arrays, meta = store.load(directory)
+        if meta['rows'] != len(base) or meta['countries'] != list(base['Country'].cat.categories):
+            return None
+        return cls(base, meta['industries'], arrays['indptr'], arrays['codes'], arrays)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @cached_property
+    def pairs_by_amount(self):
+        """All pair ids, largest Amount first (NaN last, ties in pair order)"""
+        return np.argsort(-self.amounts[self.pair_rows], kind='stable')
+
+    def code(self, industry):
+        return self._code[industry]
+
+    def country_mask(self, countries=None):
+        """Boolean mask over country codes plus a last slot for a missing Country (all True if no countries)"""
+        mask = np.ones(len(self.countries) + 1, dtype=bool)
+        if countries:
+            mask[:] = False
+            lookup = {c: i for i, c in enumerate(self.countries)}
+            mask[[lookup[c] for c in countries if c in lookup]] = True
+        return mask
+
+    def industry_counts(self):
+        """Projects per industry as a Series, most frequent first"""
+        counts = np.bincount(self.codes, minlength=len(self.industries))
+        return pd.Series(counts, index=self.industries).sort_values(ascending=False, kind='stable')
+
+    def year_rows(self, year_range):
+        """Rows with Year in [lo, hi] (inclusive), in year order"""
+        lo = np.searchsorted(self.year_values, year_range[0], side='left')
+        hi = np.searchsorted(self.year_values, year_range[1], side='right')
+        return self.year_order[self.year_offsets[lo]:self.year_offsets[hi]]
+
+    def amount_rows(self, amount_range):
+        """Rows with Amount in [lo, hi] (inclusive), in amount order"""
+        lo = np.searchsorted(self.sorted_amounts, amount_range[0], side='left')
+        hi = np.searchsorted(self.sorted_amounts, amount_range[1], side='right')
+        return self.amount_order[lo:hi]
+
+    def pairs_of(self, rows):
+        """Pair ids of the given (ascending) rows, in pair order"""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        ends = np.cumsum(lengths)
+        return np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+    def select(self, industries, year_range=None, amount_range=None, countries=None):
+        """Pairs passing the sidebar filters, as a Selection
+
+        The narrower of the year and amount intervals drives the scan; the
+        other range, the countries and the industry bitmap are only checked
+        on those candidate rows.
+        """
+        candidates = []
+        if year_range is not None:
+            candidates.append(self.year_rows(year_range))
+        if amount_range is not None:
+            candidates.append(self.amount_rows(amount_range))
+
+        if candidates:
+            rows = min(candidates, key=len)
+            if year_range is not None and len(candidates) == 2:
+                years, amounts = self.years[rows], self.amounts[rows]
+                rows = rows[(years >= year_range[0]) & (years <= year_range[1])
+                            & (amounts >= amount_range[0]) & (amounts <= amount_range[1])]
+            rows = np.sort(rows)
+        else:
+            rows = np.arange(len(self.base))
+
+        if countries:
+            rows = rows[self.country_mask(countries)[self.country_codes[rows]]]
+
+        industry_mask = np.zeros(len(self.industries), dtype=bool)
+        industry_mask[[self._code[i] for i in industries if i in self._code]] = True
+        pairs = self.pairs_of(rows)
+        return Selection(self, pairs[industry_mask[self.codes[pairs]]])
+
+    def pair_frame(self, pairs, columns, industry_labels=None):
+        """Frame of the given pairs; Industries are relabeled through industry_labels (one per code)"""
+        rows = self.pair_rows[pairs]
+        labels = np.asarray(self.industries if industry_labels is None else industry_labels, dtype=object)
+        data = {}
+        for col in columns:
+            if col == 'Industries':
+                data[col] = labels[self.codes[pairs]]
+            else:
+                data[col] = self.base[col].iloc[rows].to_numpy()
+        return pd.DataFrame(data, index=self.base.index[rows])
+
+
+class Selection:
+    """Filtered (row, industry) pairs of an IndustryIndex; rows are never copied"""
+
+    def __init__(self, index, pairs):
+        self.index = index
+        self.pairs = pairs
+        self.rows = index.pair_rows[pairs]
+        self.codes = index.codes[pairs]
+        self._by_amount = None
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def total_amount(self):
+        return float(self.index.amounts[self.rows].sum())
+
+    def mean_amount(self):
+        amounts = self.index.amounts[self.rows]
+        return float(amounts.mean()) if len(amounts) else float('nan')
+
+    def country_count(self):
+        codes = np.unique(self.index.country_codes[self.rows])
+        return int((codes >= 0).sum())
+
+    def industry_rows(self, industry):
+        """Base-table rows of one industry within the selection"""
+        code = self.index._code.get(industry)
+        return self.rows[self.codes == code] if code is not None else self.rows[:0]
+
+    def by_year(self, industry):
+        """Year, Total_Investment, Project_Count for one industry"""
+        rows = self.industry_rows(industry)
+        years, inverse = np.unique(self.index.years[rows], return_inverse=True)
+        return pd.DataFrame({
+            'Year': years,
+            'Total_Investment': np.bincount(inverse, weights=self.index.amounts[rows], minlength=len(years)),
+            'Project_Count': np.bincount(inverse, minlength=len(years)),
+        })
+
+    def by_country(self, industry):
+        """Country, Total_Investment, Project_Count for one industry, largest first"""
+        rows = self.industry_rows(industry)
+        codes = self.index.country_codes[rows]
+        keep = codes >= 0
+        n = len(self.index.countries)
+        totals = np.bincount(codes[keep], weights=self.index.amounts[rows][keep], minlength=n)
+        counts = np.bincount(codes[keep], minlength=n)
+        present = np.flatnonzero(counts)
+        stats = pd.DataFrame({
+            'Country': np.asarray(self.index.countries, dtype=object)[present],
+            'Total_Investment': totals[present],
+            'Project_Count': counts[present],
+        })
+        return stats.sort_values('Total_Investment', ascending=False, kind='stable').reset_index(drop=True)
+
+    def by_amount(self):
+        """Selected pair ids, largest Amount first (filtered from the index's precomputed order)"""
+        if self._by_amount is None:
+            selected = np.zeros(len(self.index), dtype=bool)
+            selected[self.pairs] = True
+            order = self.index.pairs_by_amount
+            self._by_amount = order[selected[order]]
+        return self._by_amount
+
+    def frame(self, columns, industry_labels=None):
+        """Pair-level frame (one row per project and industry) for display"""
+        return self.index.pair_frame(self.pairs, columns, industry_labels)
+
+    def page(self, columns, start, stop, industry_labels=None):
+        """Rows start:stop of the selection sorted by Amount (largest first)"""
+        return self.index.pair_frame(self.by_amount()[start:stop], columns, industry_labels)
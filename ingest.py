@@ -0,0 +1,172 @@
+"""Incremental ingest of a new tracker release
+
+Compares the new CSV against the newest store built from the same path: rows
+whose fingerprint is already known keep their classification, only new or
+edited rows are classified, and the aggregate cube is updated by the delta
+(added minus removed rows) instead of being rebuilt.
+
+With --chunk-rows the store and cube are instead rebuilt out of core: the
+file is read, classified, stored and aggregated in chunks of that many rows.
+Memory then depends on the chunk size and on the distinct strings of the text
+columns (one dictionary per column for the whole file), not on the row count.
+
+Usage: python ingest.py [china_investment_tracker.csv] [--workers N] [--chunk-rows 200000]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+import store
+from classifier import (DATA_FILE, STREAM_CHUNK_ROWS, build_dataset, latest_store, load_dataset, mark_latest,
+                        store_dir, stream_dataset, update_dataset)
+from cube import AggregateCube, CubeAccumulator
+from industry_index import IndustryIndex
+from rollup import PeriodRollup
+from sketch import AmountSketch
+
+CUBE_DIR = 'cube'
+INDEX_DIR = 'index'
+ROLLUP_DIR = 'rollup'
+SKETCH_DIR = 'sketch'
+
+
+def artifact_dir(dataset, name):
+    """Where one of the dashboard's structures (INDEX_DIR, CUBE_DIR, ...) for a stored dataset lives"""
+    return os.path.join(dataset.directory, name)
+
+
+def dashboard_index(dataset):
+    return IndustryIndex.from_result(dataset.df, dataset.results['dashboard'])
+
+
+def _row_deltas(old_fingerprints, new_fingerprints):
+    """(old rows, weights) removed and (new rows, weights) added, as multisets"""
+    n_old = len(old_fingerprints)
+    everything = np.concatenate([old_fingerprints, new_fingerprints])
+    unique, inverse = np.unique(everything, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    old_counts = np.bincount(inverse[:n_old], minlength=len(unique))
+    new_counts = np.bincount(inverse[n_old:], minlength=len(unique))
+    diff = new_counts - old_counts
+
+    # Representative (first) row per fingerprint on each side
+    old_first = np.full(len(unique), -1, dtype=np.int64)
+    new_first = np.full(len(unique), -1, dtype=np.int64)
+    present, positions = np.unique(inverse[:n_old], return_index=True)
+    old_first[present] = positions
+    present, positions = np.unique(inverse[n_old:], return_index=True)
+    new_first[present] = positions
+
+    removed = np.flatnonzero(diff < 0)
+    added = np.flatnonzero(diff > 0)
+    return (old_first[removed], -diff[removed]), (new_first[added], diff[added])
+
+
+def _saved(dataset, path):
+    """dataset, if its store was written (the app falls back to memory; a batch run should fail)"""
+    if dataset.directory is None:
+        raise OSError(f'could not write the store for {path} under {store_dir(path)}')
+    return dataset
+
+
+def ingest(path=DATA_FILE, workers=None):
+    """Bring the store (and its cube) up to date with path; returns (dataset, report)
+
+    workers: classification processes (default CLASSIFY_WORKERS, see classify_all).
+    """
+    started = time.perf_counter()
+    directory = store_dir(path)
+    if store.exists(directory):
+        dataset = load_dataset(directory)
+        mark_latest(path, directory)
+        return dataset, {'mode': 'unchanged', 'rows': len(dataset.df), 'classified': 0,
+                         'seconds': time.perf_counter() - started}
+
+    previous_dir = latest_store(path)
+    if previous_dir is None:
+        dataset = _saved(build_dataset(path, workers), path)
+        index = dashboard_index(dataset)
+        index.save(artifact_dir(dataset, INDEX_DIR))
+        AggregateCube(index, dataset.version).save(artifact_dir(dataset, CUBE_DIR))
+        PeriodRollup(index).save(artifact_dir(dataset, ROLLUP_DIR))
+        AmountSketch(index).save(artifact_dir(dataset, SKETCH_DIR))
+        return dataset, {'mode': 'full', 'rows': len(dataset.df), 'classified': len(dataset.df),
+                         'seconds': time.perf_counter() - started}
+
+    previous = load_dataset(previous_dir)
+    dataset, classified_rows = update_dataset(path, previous, workers)
+    _saved(dataset, path)
+    df, results = dataset.df, dataset.results
+
+    index = dashboard_index(dataset)
+    index.save(artifact_dir(dataset, INDEX_DIR))
+    PeriodRollup(index).save(artifact_dir(dataset, ROLLUP_DIR))
+    AmountSketch(index).save(artifact_dir(dataset, SKETCH_DIR))
+    (removed_rows, removed_weights), (added_rows, added_weights) = _row_deltas(previous.fingerprints,
+                                                                               dataset.fingerprints)
+    previous_cube = artifact_dir(previous, CUBE_DIR)
+    if store.exists(previous_cube):
+        _, totals, axes = store.load(previous_cube, mmap=False)
+        changes = [
+            (IndustryIndex.from_result(previous.df.iloc[removed_rows], previous.results['dashboard'].take(removed_rows)),
+             -removed_weights),
+            (IndustryIndex.from_result(df.iloc[added_rows], results['dashboard'].take(added_rows)), added_weights),
+        ]
+        cube = AggregateCube.updated((axes, (totals['count'], totals['total'], totals['sumsq'])),
+                                     index, dataset.version, changes)
+        cube_mode = 'delta'
+    else:
+        cube = AggregateCube(index, dataset.version)
+        cube_mode = 'rebuilt'
+    cube.save(artifact_dir(dataset, CUBE_DIR))
+
+    return dataset, {
+        'mode': 'incremental',
+        'rows': len(df),
+        'classified': len(classified_rows),
+        'added': int(added_weights.sum()),
+        'removed': int(removed_weights.sum()),
+        'cube': cube_mode,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def ingest_streaming(path=DATA_FILE, chunk_rows=STREAM_CHUNK_ROWS, workers=None):
+    """Rebuild the store and cube of path chunk by chunk (see stream_dataset); returns a report"""
+    started = time.perf_counter()
+    cube = CubeAccumulator()
+    chunks = []
+
+    def aggregate(df, results):
+        cube.add(IndustryIndex.from_result(df, results['dashboard']))
+        chunks.append(len(df))
+
+    directory, rows = stream_dataset(path, chunk_rows, workers, on_chunk=aggregate)
+    cube.save(os.path.join(directory, CUBE_DIR))
+    return {'mode': 'streamed', 'rows': rows, 'classified': rows, 'chunks': len(chunks),
+            'directory': directory, 'seconds': time.perf_counter() - started}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bring the classified store and cube up to date with a tracker CSV')
+    parser.add_argument('csv', nargs='?', default=DATA_FILE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='classification processes (default CLASSIFY_WORKERS; 0 = one per core)')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help='rebuild out of core in chunks of this many rows')
+    args = parser.parse_args()
+
+    if args.chunk_rows:
+        report = ingest_streaming(args.csv, args.chunk_rows, args.workers)
+        directory = report['directory']
+    else:
+        dataset, report = ingest(args.csv, args.workers)
+        directory = dataset.directory
+    print(f"✅ {report['mode']}: {report['rows']:,} rows, {report['classified']:,} classified "
+          f"in {report['seconds']:.2f}s → {directory}")
+    if report['mode'] == 'incremental':
+        print(f"  +{report['added']:,} / -{report['removed']:,} rows, cube {report['cube']}")
+    if report['mode'] == 'streamed':
+        print(f"  {report['chunks']:,} chunks")
@@ -0,0 +1,190 @@
+"""Per-rerun stage timing, cache hit/miss counts and optional profiling
+
+A Trace records wall time, calls and row counts per named stage (stages may
+nest, e.g. Plotly serialization inside a tab) plus hits and misses of every
+LRUCache looked up while it is active. rerun() opens one per Streamlit rerun
+or API request: when it closes, the trace is logged as one JSON line on the
+'dashboard.timing' logger and added to the process-wide REGISTRY, which
+renders Prometheus text for serve_metrics() and the API's /metrics.
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from filter_cache import LRUCache
+
+logger = logging.getLogger('dashboard.timing')
+_current = contextvars.ContextVar('dashboard_trace', default=None)
+
+# Lines of cProfile output kept per profiled rerun
+PROFILE_LINES = 40
+
+
+class Trace:
+    """Timings of one rerun"""
+
+    def __init__(self, name='rerun'):
+        self.name = name
+        self.started = time.time()
+        self.seconds = None
+        self.stages = {}
+        self.caches = {}
+        self.profile = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': None})
+        entry['seconds'] += seconds
+        entry['calls'] += 1
+
+    def rows(self, name, rows):
+        """Attach a row count to a stage"""
+        self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': None})['rows'] = int(rows)
+
+    def cache_lookup(self, cache, hit):
+        entry = self.caches.setdefault(cache, {'hits': 0, 'misses': 0})
+        entry['hits' if hit else 'misses'] += 1
+
+    def as_dict(self):
+        return {
+            'trace': self.name,
+            'started': round(self.started, 3),
+            'seconds': None if self.seconds is None else round(self.seconds, 6),
+            'stages': {name: dict(entry, seconds=round(entry['seconds'], 6)) for name, entry in self.stages.items()},
+            'caches': self.caches,
+        }
+
+
+def current():
+    """The active trace, or a throwaway one when nothing is being traced"""
+    trace = _current.get()
+    return trace if trace is not None else Trace('untraced')
+
+
+def _observe_cache(cache, hit):
+    trace = _current.get()
+    if trace is not None:
+        trace.cache_lookup(cache or 'cache', hit)
+
+
+LRUCache.observer = staticmethod(_observe_cache)
+
+
+class MetricsRegistry:
+    """Totals over finished traces, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = defaultdict(int)
+        self.run_seconds = defaultdict(float)
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.stage_rows = {}
+        self.cache_lookups = defaultdict(int)
+
+    def observe(self, trace):
+        with self._lock:
+            self.runs[trace.name] += 1
+            self.run_seconds[trace.name] += trace.seconds or 0.0
+            for name, entry in trace.stages.items():
+                self.stage_seconds[trace.name, name] += entry['seconds']
+                self.stage_calls[trace.name, name] += entry['calls']
+                if entry['rows'] is not None:
+                    self.stage_rows[trace.name, name] = entry['rows']
+            for cache, entry in trace.caches.items():
+                self.cache_lookups[cache, 'hit'] += entry['hits']
+                self.cache_lookups[cache, 'miss'] += entry['misses']
+
+    def render(self):
+        def series(metric, kind, help_text, values, labels):
+            lines = [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+            for key, value in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                label_text = ','.join(f'{label}="{_escape(v)}"' for label, v in zip(labels, key))
+                lines.append(f'{metric}{{{label_text}}} {value}')
+            return lines
+
+        with self._lock:
+            lines = []
+            lines += series('dashboard_runs_total', 'counter', 'Finished reruns / requests',
+                            self.runs, ['trace'])
+            lines += series('dashboard_run_seconds_total', 'counter', 'Wall time of finished reruns / requests',
+                            self.run_seconds, ['trace'])
+            lines += series('dashboard_stage_seconds_total', 'counter', 'Wall time per stage',
+                            self.stage_seconds, ['trace', 'stage'])
+            lines += series('dashboard_stage_calls_total', 'counter', 'Calls per stage',
+                            self.stage_calls, ['trace', 'stage'])
+            lines += series('dashboard_stage_rows', 'gauge', 'Rows handled by the last call of a stage',
+                            self.stage_rows, ['trace', 'stage'])
+            lines += series('dashboard_cache_lookups_total', 'counter', 'Cache lookups by result',
+                            self.cache_lookups, ['cache', 'result'])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextlib.contextmanager
+def rerun(name='rerun', profile=False):
+    """Trace (and with profile=True, cProfile) everything inside the block"""
+    trace = Trace(name)
+    token = _current.set(trace)
+    profiler = cProfile.Profile() if profile else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield trace
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            trace.profile = out.getvalue()
+        trace.seconds = time.perf_counter() - start
+        _current.reset(token)
+        REGISTRY.observe(trace)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(trace.as_dict()))
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Serve REGISTRY as Prometheus text on http://host:port/metrics from a daemon thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,211 @@
+"""Monthly and quarterly rollups with rolling windows and year-over-year growth
+
+Year and Month are parsed once into a period number per row (months since
+January of the first year). Count and Amount totals per industry × country ×
+month are accumulated once over the (row, industry) pairs. A query sums the
+selected countries, corrects for the amount range from the few rows outside
+(or inside) it, and keeps cumulative sums along time, so every period total,
+rolling-window sum and YoY comparison is one subtraction of prefix sums.
+
+Rows whose Month cannot be parsed have no period and are left out; yearly
+figures come from the aggregate cube.
+
+The period numbers and totals are saved in the classified store next to the
+cube, and later processes memory-map them instead of parsing Month again.
+"""
+import numpy as np
+import pandas as pd
+
+import store
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+# Month text (full or three-letter name, any case) -> 1..12
+MONTH_NUMBERS = {name.lower()[:n]: i + 1 for i, name in enumerate(MONTHS) for n in (3, len(name))}
+
+# Months per period
+GRANULARITIES = {'month': 1, 'quarter': 3}
+
+
+def month_numbers(values):
+    """1..12 per value of a Month column (0 when missing or unparseable), parsed once per distinct value"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    lookup = np.zeros(len(uniques) + 1, dtype=np.int8)  # code -1 picks the trailing 0
+    for i, value in enumerate(uniques):
+        lookup[i] = MONTH_NUMBERS.get(str(value).strip().lower(), 0)
+    return lookup[codes]
+
+
+class PeriodRollup:
+    """Count / Amount totals per industry × country × month over an IndustryIndex"""
+
+    def __init__(self, index, arrays=None):
+        self.index = index
+        self.first_year = int(index.year_values[0]) if len(index.year_values) else 0
+        last_year = int(index.year_values[-1]) if len(index.year_values) else -1
+        self.n_months = 12 * (last_year - self.first_year + 1)
+        self.n_countries = len(index.countries) + 1  # last slot: missing Country
+
+        starts = np.arange(self.n_months)
+        years = self.first_year + starts // 12
+        self.labels = {
+            'month': np.array([f'{y}-{m:02d}' for y, m in zip(years, starts % 12 + 1)], dtype=object),
+            'quarter': np.array([f'{y}Q{q}' for y, q in zip(years[::3], starts[::3] % 12 // 3 + 1)], dtype=object),
+        }
+
+        if arrays is not None:
+            # Loaded by load(): nothing to parse or aggregate
+            self.periods, self.count, self.total = arrays['periods'], arrays['count'], arrays['total']
+            return
+
+        months = month_numbers(index.base['Month'])
+        self.periods = np.where(months > 0, (index.years.astype(np.int32) - self.first_year) * 12 + months - 1,
+                                -1).astype(np.int32)
+
+        pair_amounts = index.amounts[index.pair_rows]
+        pairs = np.flatnonzero(~np.isnan(pair_amounts) & (self.periods[index.pair_rows] >= 0))
+        cells = self._cells(pairs)
+        shape = (len(index.industries), self.n_countries, self.n_months)
+        size = int(np.prod(shape))
+        self.count = np.bincount(cells, minlength=size).reshape(shape)
+        self.total = np.bincount(cells, weights=pair_amounts[pairs], minlength=size).reshape(shape)
+
+    def save(self, directory):
+        store.save(directory, pd.DataFrame(), {'periods': self.periods, 'count': self.count, 'total': self.total},
+                   self._axes_for(self.index))
+
+    @classmethod
+    def load(cls, directory, index):
+        """Rollup saved for this index, or None (see store.load_matching)"""
+        arrays = store.load_matching(directory, cls._axes_for(index))
+        return None if arrays is None else cls(index, arrays)
+
+    @staticmethod
+    def _axes_for(index):
+        """JSON-able axes of the rollup an index would produce"""
+        return {
+            'industries': list(index.industries),
+            'countries': list(index.countries),
+            'years': [int(y) for y in index.year_values],
+            'rows': len(index.base),
+        }
+
+    def _country_slots(self, rows):
+        codes = self.index.country_codes[rows]
+        return np.where(codes < 0, self.n_countries - 1, codes)
+
+    def _cells(self, pairs):
+        rows = self.index.pair_rows[pairs]
+        codes = self.index.codes[pairs].astype(np.int64)
+        return (codes * self.n_countries + self._country_slots(rows)) * self.n_months + self.periods[rows]
+
+    def query(self, industries, year_range=None, amount_range=None, countries=None):
+        """Monthly totals for the sidebar filters, as a PeriodSlice"""
+        index = self.index
+        known = list(dict.fromkeys(i for i in industries if i in index._code))
+        codes = np.array([index.code(i) for i in known], dtype=np.intp)
+
+        country_mask = index.country_mask(countries)
+
+        count = self.count[codes][:, country_mask].sum(axis=1)
+        total = self.total[codes][:, country_mask].sum(axis=1)
+
+        if amount_range is not None and len(codes):
+            # Rows with an amount, in amount order: either subtract the ones
+            # outside the range or start over from the ones inside it
+            n_valid = np.searchsorted(index.sorted_amounts, np.inf, side='right')  # NaN sorts last
+            lo = np.searchsorted(index.sorted_amounts[:n_valid], amount_range[0], side='left')
+            hi = np.searchsorted(index.sorted_amounts[:n_valid], amount_range[1], side='right')
+            if hi - lo < n_valid - (hi - lo):
+                count[:], total[:] = 0, 0
+                self._add(count, total, index.amount_order[lo:hi], codes, country_mask, 1)
+            else:
+                outside = np.concatenate([index.amount_order[:lo], index.amount_order[hi:n_valid]])
+                self._add(count, total, outside, codes, country_mask, -1)
+
+        if year_range is not None:
+            years = self.first_year + np.arange(self.n_months) // 12
+            outside = (years < year_range[0]) | (years > year_range[1])
+            count[:, outside], total[:, outside] = 0, 0
+        return PeriodSlice(known, self.first_year, count, total, self.labels, year_range)
+
+    def _add(self, count, total, rows, codes, country_mask, sign):
+        """Add sign × the pairs of rows (selected industries and countries only) to monthly totals"""
+        rows = rows[(self.periods[rows] >= 0) & country_mask[self._country_slots(rows)]]
+        pairs = self.index.pairs_of(np.sort(rows))
+        selected = np.full(len(self.index.industries), -1, dtype=np.intp)
+        selected[codes] = np.arange(len(codes))
+        i = selected[self.index.codes[pairs]]
+        keep = i >= 0
+        pairs, i = pairs[keep], i[keep]
+        rows = self.index.pair_rows[pairs]
+        cells = i * self.n_months + self.periods[rows]
+        size = count.size
+        count += sign * np.bincount(cells, minlength=size).reshape(count.shape)
+        total += sign * np.bincount(cells, weights=self.index.amounts[rows], minlength=size).reshape(total.shape)
+
+
+class PeriodSlice:
+    """Monthly totals of selected industries, with prefix sums for window queries"""
+
+    def __init__(self, industries, first_year, count, total, labels, year_range=None):
+        self.industries = list(industries)
+        self.first_year = first_year
+        self.year_range = year_range
+        self.labels = labels  # period labels per granularity, from PeriodRollup
+        self._row = {name: i for i, name in enumerate(self.industries)}
+        n = count.shape[1]
+        # cum[:, m] is the total of months 0..m-1, so months a..b-1 sum to cum[:, b] - cum[:, a]
+        self.cum_count = np.zeros((len(self.industries), n + 1), dtype=np.int64)
+        self.cum_total = np.zeros((len(self.industries), n + 1), dtype=np.float64)
+        np.cumsum(count, axis=1, out=self.cum_count[:, 1:])
+        np.cumsum(total, axis=1, out=self.cum_total[:, 1:])
+
+    @property
+    def n_months(self):
+        return self.cum_count.shape[1] - 1
+
+    def window(self, industry, end, months):
+        """(projects, amount) of the months months before end (exclusive), end counted from month 0"""
+        i = self._row[industry]
+        start = max(end - months, 0)
+        return int(self.cum_count[i, end] - self.cum_count[i, start]), \
+            float(self.cum_total[i, end] - self.cum_total[i, start])
+
+    def series(self, industry, granularity='month', window=None):
+        """Period, Total_Investment, Project_Count, Rolling_Investment and YoY_% of one industry
+
+        Rolling_Investment sums the last window periods (default: one year's
+        worth); YoY_% compares each period with the same period a year earlier
+        (NaN when that had none). Only periods inside the year range are listed.
+        """
+        step = GRANULARITIES[granularity]
+        window = 12 // step if window is None else window
+        ends = np.arange(step, self.n_months + 1, step)
+        i = self._row.get(industry)
+        if i is None:
+            return pd.DataFrame({'Period': [], 'Total_Investment': [], 'Project_Count': [],
+                                 'Rolling_Investment': [], 'YoY_%': []})
+        cum_count, cum_total = self.cum_count[i], self.cum_total[i]
+
+        totals = cum_total[ends] - cum_total[ends - step]
+        counts = cum_count[ends] - cum_count[ends - step]
+        rolling = cum_total[ends] - cum_total[np.maximum(ends - window * step, 0)]
+        previous = cum_total[np.maximum(ends - 12, 0)] - cum_total[np.maximum(ends - 12 - step, 0)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yoy = np.where((ends > 12) & (previous > 0), (totals - previous) / previous * 100, np.nan)
+
+        years = self.first_year + (ends - step) // 12
+        within = np.ones(len(ends), dtype=bool)
+        if self.year_range is not None:
+            within = (years >= self.year_range[0]) & (years <= self.year_range[1])
+        return pd.DataFrame({
+            'Period': self.labels[granularity][within],
+            'Total_Investment': totals[within],
+            'Project_Count': counts[within],
+            'Rolling_Investment': rolling[within],
+            'YoY_%': yoy[within],
+        })
@@ -0,0 +1,201 @@
+"""Mergeable amount sketches for approximate overview metrics
+
+Amounts are counted in log-spaced bins, as in DDSketch: a bin's
+representative value is within ALPHA (relative) of every amount in it, so
+totals, means and quantiles merged from bins are too. There is one sketch
+per industry × country partition, kept cumulatively along the year axis.
+Bins the amount range covers fully therefore merge as the difference of two
+year slices over the selected partitions, whatever the number of rows.
+
+The range covers at most two bins only partly. Those are resolved from their
+rows, as cube.py does for partly covered buckets, but a bin is about 10%
+wide where a cube bucket spans up to a factor of 2.5. Project counts and
+distinct countries are therefore exact. A bitmap over the small country axis
+does the job of a HyperLogLog. Totals, means and quantiles are within ALPHA.
+
+Only partitions with projects are kept. ingest.py saves them in the classified
+store next to the cube, and processes memory-map them from there.
+"""
+import numpy as np
+import pandas as pd
+
+import store
+from cube import AMOUNT_EDGES
+
+# Relative accuracy of amounts (5%); amounts up to MIN_AMOUNT share the first bin
+ALPHA = 0.05
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+MIN_AMOUNT = 1.0
+
+
+# The cube's bucket edges (the usual sidebar bounds) get a bin of their own
+POINTS = AMOUNT_EDGES[AMOUNT_EDGES > MIN_AMOUNT]
+
+
+def bin_edges(max_amount):
+    """Upper bin edges: a log grid of ratio GAMMA, plus a point bin per POINTS amount
+
+    Bin k covers (edges[k - 1], edges[k]]. Round amounts such as 200 are
+    common, so a range starting or ending on one must count them exactly.
+    """
+    steps = int(np.ceil(np.log(max(max_amount, MIN_AMOUNT) / MIN_AMOUNT) / np.log(GAMMA))) + 1
+    grid = MIN_AMOUNT * GAMMA ** np.arange(steps)
+    return np.unique(np.concatenate([grid, np.nextafter(POINTS, 0), POINTS]))
+
+
+def representative(lower, upper):
+    """Amount within ALPHA (relative) of every amount in (lower, upper] (DDSketch's choice)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(lower > 0, 2 * lower * upper / (lower + upper), upper / 2)
+
+
+class AmountSketch:
+    """Year-cumulative amount histograms per non-empty industry × country partition of an IndustryIndex"""
+
+    def __init__(self, index, arrays=None):
+        self.index = index
+        self.years = index.year_values
+        self.n_countries = len(index.countries) + 1  # last slot: missing Country
+
+        if arrays is not None:
+            # Loaded by load(): nothing to count
+            self.edges, self.parts, self.cum = arrays['edges'], arrays['parts'], arrays['cum']
+        else:
+            self._build()
+        self.lower = np.append(0.0, self.edges[:-1])
+        self.point = np.isin(self.edges, POINTS) & (self.lower == np.nextafter(self.edges, 0))
+        self.part_industries = self.parts // self.n_countries
+        self.part_countries = self.parts % self.n_countries
+
+    def _build(self):
+        index = self.index
+        amounts = index.amounts[index.pair_rows]
+        pairs = np.flatnonzero(~np.isnan(amounts))  # NaN amounts never pass the amount filter
+        self.edges = bin_edges(float(amounts[pairs].max()) if len(pairs) else MIN_AMOUNT)
+        n_bins, n_years = len(self.edges), len(self.years)
+        bins = np.minimum(np.searchsorted(self.edges, amounts[pairs], side='left'), n_bins - 1)
+
+        rows = index.pair_rows[pairs]
+        countries = index.country_codes[rows]
+        countries = np.where(countries < 0, self.n_countries - 1, countries)
+        parts = index.codes[pairs].astype(np.int64) * self.n_countries + countries
+        self.parts, part = np.unique(parts, return_inverse=True)
+        # cum[p, y] holds the years before y, so years a..b-1 are cum[p, b] - cum[p, a]: each
+        # project is counted in the slot after its year, then summed up along the years
+        years = np.searchsorted(self.years, index.years[rows]) + 1
+        cells, counts = np.unique((part.reshape(-1) * (n_years + 1) + years) * n_bins + bins, return_counts=True)
+        self.cum = np.zeros((len(self.parts), n_years + 1, n_bins), dtype=np.int32)
+        self.cum.reshape(-1)[cells] = counts
+        for y in range(2, n_years + 1):
+            self.cum[:, y] += self.cum[:, y - 1]
+
+    def save(self, directory):
+        store.save(directory, pd.DataFrame(), {'edges': self.edges, 'parts': self.parts, 'cum': self.cum},
+                   self._axes_for(self.index))
+
+    @classmethod
+    def load(cls, directory, index):
+        """Sketches saved for this index, or None (see store.load_matching)"""
+        arrays = store.load_matching(directory, cls._axes_for(index))
+        return None if arrays is None else cls(index, arrays)
+
+    @staticmethod
+    def _axes_for(index):
+        """JSON-able axes (and accuracy) of the sketches an index would produce"""
+        return {
+            'industries': list(index.industries),
+            'countries': list(index.countries),
+            'years': [int(y) for y in index.year_values],
+            'rows': len(index.base),
+            'alpha': ALPHA,
+            'points': POINTS.tolist(),
+        }
+
+    def _bins(self, amount_range):
+        """(bins inside the range, bins it covers only partly)"""
+        if amount_range is None:
+            return np.arange(len(self.edges)), np.array([], dtype=np.intp)
+        lo, hi = amount_range
+        inside = ((self.lower >= lo) | self.point) & (self.edges >= lo) & (self.edges <= hi)
+        overlap = (self.edges >= lo) & (self.lower < hi)
+        return np.flatnonzero(inside), np.flatnonzero(overlap & ~inside & ~self.point)
+
+    def query(self, industries, year_range=None, amount_range=None, countries=None):
+        """Merged sketch for the sidebar filters, as a SketchSlice"""
+        selected = np.zeros(len(self.index.industries), dtype=bool)
+        selected[[self.index.code(i) for i in industries if i in self.index._code]] = True
+        country_mask = self.index.country_mask(countries)
+        parts = np.flatnonzero(selected[self.part_industries] & country_mask[self.part_countries])
+
+        lo, hi = 0, len(self.years)
+        if year_range is not None:
+            lo = np.searchsorted(self.years, year_range[0], side='left')
+            hi = np.searchsorted(self.years, year_range[1], side='right')
+        inside, partial = self._bins(amount_range)
+
+        # Bin counts of the selected partitions and years; bins inside the range from the sketches
+        counts = np.zeros(len(self.edges))
+        values = representative(self.lower, self.edges)
+        merged = self.cum[parts, hi][:, inside] - self.cum[parts, lo][:, inside]
+        counts[inside] = merged.sum(axis=0)
+        present = np.bincount(self.part_countries[parts], weights=merged.sum(axis=1), minlength=self.n_countries) > 0
+        for k in partial:
+            count, total, found = self._scan(k, selected, country_mask, year_range, amount_range)
+            counts[k] = count
+            values[k] = total / count if count else values[k]
+            present |= found
+        present[-1] = False  # the missing-Country slot is not a country
+        return SketchSlice(counts, np.nan_to_num(values), int(present.sum()))
+
+    def _scan(self, k, selected, country_mask, year_range, amount_range):
+        """(projects, amount, country slots found) of bin k's part of the range, from its rows"""
+        index = self.index
+        rows = index.amount_rows((max(self.lower[k], amount_range[0]), min(self.edges[k], amount_range[1])))
+        rows = rows[index.amounts[rows] > self.lower[k]]  # bin k is (lower, upper]
+        if year_range is not None:
+            years = index.years[rows]
+            rows = rows[(years >= year_range[0]) & (years <= year_range[1])]
+        slots = index.country_codes[rows]
+        slots = np.where(slots < 0, self.n_countries - 1, slots)
+        rows = rows[country_mask[slots]]
+        pairs = index.pairs_of(np.sort(rows))
+        pair_rows = index.pair_rows[pairs[selected[index.codes[pairs]]]]
+        slots = index.country_codes[pair_rows]
+        found = np.zeros(self.n_countries, dtype=bool)
+        found[np.where(slots < 0, self.n_countries - 1, slots)] = True
+        return len(pair_rows), float(index.amounts[pair_rows].sum()), found
+
+
+class SketchSlice:
+    """Aggregates of one filter state from bin counts (same overview methods as CubeSlice)
+
+    Projects and countries are exact; amounts are within ALPHA.
+    """
+
+    approximate = True
+
+    def __init__(self, counts, values, countries):
+        self.counts = counts
+        self.values = values
+        self.countries = countries
+
+    def __len__(self):
+        return int(round(self.counts.sum()))
+
+    def total_amount(self):
+        return float(self.counts @ self.values)
+
+    def mean_amount(self):
+        n = self.counts.sum()
+        return self.total_amount() / n if n >= 0.5 else float('nan')
+
+    def country_count(self):
+        return self.countries
+
+    def quantile(self, q):
+        """Amount at quantile q (0..1) of the selected projects"""
+        n = self.counts.sum()
+        if n < 0.5:
+            return float('nan')
+        rank = np.searchsorted(np.cumsum(self.counts), q * n, side='right')
+        return float(self.values[min(rank, len(self.values) - 1)])
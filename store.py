@@ -0,0 +1,342 @@
+"""Persistent columnar store: one .npy file per column, memory-mapped on load
+
+String columns are dictionary-encoded (int32 codes + a JSON category list),
+categorical columns keep their own codes and come back as categoricals,
+numeric columns and extra arrays are saved as-is. A store is written to a
+temporary directory and renamed into place, so readers never see half of one
+(and of two processes writing the same store at once, the first one wins).
+StoreWriter builds the same layout chunk by chunk, for data larger than memory
+(its string dictionaries still hold every distinct value, see StringEncoder).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = 'manifest.json'
+# .npy header size of files written by StoreWriter (rewritten with the final shape)
+HEADER_SIZE = 128
+# Rows per slice when StoreWriter rewrites a finished column
+REWRITE_ROWS = 1 << 20
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_strings(values):
+    """Dictionary-encode an object array: (int32 codes, categories), NaN -> -1"""
+    codes, categories = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes.astype(np.int32), [str(c) for c in categories]
+
+
+def code_dtype(categories):
+    """Smallest integer dtype pandas keeps category codes in (so from_codes need not copy them)"""
+    n = len(categories)
+    return np.int8 if n < 127 else np.int16 if n < 32767 else np.int32
+
+
+def _move_into_place(tmp, directory):
+    """Rename a finished tmp directory to directory, replacing an older copy
+
+    The older copy is renamed aside before it is deleted. If another writer
+    moves its copy in first, that one is kept and tmp is dropped: stores are
+    named after their inputs, so both hold the same data.
+    """
+    old = None
+    if os.path.exists(directory):
+        old = tempfile.mkdtemp(prefix='.old-', dir=os.path.dirname(os.path.abspath(directory)))
+        try:
+            os.replace(directory, old)
+        except FileNotFoundError:
+            pass
+    try:
+        os.replace(tmp, directory)
+    except OSError:
+        if not exists(directory):
+            raise
+        shutil.rmtree(tmp, ignore_errors=True)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def save(directory, frame, arrays=None, meta=None):
+    """Write frame columns, extra numpy arrays and a JSON-able meta dict"""
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+    manifest = {'rows': len(frame), 'columns': [], 'arrays': [], 'meta': meta or {}}
+
+    try:
+        for i, col in enumerate(frame.columns):
+            values = frame[col]
+            entry = {'name': col, 'file': f'col_{i}.npy'}
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                entry['kind'] = 'category'
+                entry['categories'] = values.cat.categories.tolist()
+                np.save(os.path.join(tmp, entry['file']), values.cat.codes.to_numpy())
+            elif pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                entry['kind'] = 'numeric'
+                np.save(os.path.join(tmp, entry['file']), values.to_numpy())
+            else:
+                entry['kind'] = 'strings'
+                codes, categories = encode_strings(values.to_numpy(dtype=object))
+                entry['categories'] = categories
+                np.save(os.path.join(tmp, entry['file']), codes.astype(code_dtype(categories)))
+            manifest['columns'].append(entry)
+
+        for i, (name, array) in enumerate((arrays or {}).items()):
+            entry = {'name': name, 'file': f'arr_{i}.npy'}
+            np.save(os.path.join(tmp, entry['file']), np.asarray(array))
+            manifest['arrays'].append(entry)
+
+        with open(os.path.join(tmp, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        _move_into_place(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def exists(directory):
+    return os.path.exists(os.path.join(directory, MANIFEST))
+
+
+def load(directory, mmap=True):
+    """(frame, arrays, meta) from a store written by save
+
+    With mmap, numeric columns, category codes and arrays stay views of the
+    files, so processes loading the same store share those pages in the OS
+    page cache. String columns load as categoricals for the same reason.
+    """
+    with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    mmap_mode = 'r' if mmap else None
+
+    columns = {}
+    for entry in manifest['columns']:
+        data = np.load(os.path.join(directory, entry['file']), mmap_mode=mmap_mode)
+        if entry['kind'] in ('strings', 'category'):
+            data = pd.Categorical.from_codes(np.asarray(data), entry['categories'])
+        columns[entry['name']] = data
+    frame = pd.DataFrame(columns, copy=False)
+
+    arrays = {entry['name']: np.load(os.path.join(directory, entry['file']), mmap_mode=mmap_mode)
+              for entry in manifest['arrays']}
+    return frame, arrays, manifest['meta']
+
+
+def load_matching(directory, meta):
+    """Arrays of a store saved with this meta (memory-mapped, read-only)
+
+    None if there is no store or it was saved with other meta, e.g. for other
+    axes or by an older version, so the caller rebuilds it.
+    """
+    if not exists(directory):
+        return None
+    _, arrays, saved = load(directory)
+    return arrays if saved == meta else None
+
+
+class StringEncoder:
+    """Dictionary encoding shared by every chunk of a column (categories in first-seen order)
+
+    Every distinct value stays in memory until finish, since they all go into
+    the manifest (which load() reads whole anyway). For columns like Investor
+    and Partner/Target that grows with the file: the tracker has one distinct
+    Partner/Target per two rows.
+    """
+
+    def __init__(self):
+        self.categories = []
+        self._code = {}
+
+    def encode(self, values):
+        """int32 codes of a chunk (NaN -> -1), adding its new values to categories"""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        lookup = np.full(len(uniques) + 1, -1, dtype=np.int32)  # code -1 stays -1
+        for i, value in enumerate(uniques):
+            value = str(value)
+            code = self._code.get(value)
+            if code is None:
+                code = self._code[value] = len(self.categories)
+                self.categories.append(value)
+            lookup[i] = code
+        return lookup[codes]
+
+
+def _npy_header(dtype, shape):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': tuple(shape)})
+    header = header.ljust(HEADER_SIZE - 11) + '\n'
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+
+class _ArrayFile:
+    """.npy file that rows are appended to; the header gets the row count on close"""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.file = None
+        self.dtype = None
+        self.tail = ()
+        self.rows = 0
+
+    def append(self, array):
+        array = np.ascontiguousarray(array)
+        if self.file is None:
+            self.dtype, self.tail = array.dtype, array.shape[1:]
+            self.file = open(self.path, 'wb')
+            self.file.write(_npy_header(self.dtype, (0,) + self.tail))
+        elif array.dtype != self.dtype:
+            if array.shape[1:] != self.tail or not np.can_cast(array.dtype, self.dtype):
+                raise ValueError(f'{self.name}: chunk of {array.dtype} {array.shape[1:]} '
+                                 f'does not fit {self.dtype} {self.tail}')
+            array = array.astype(self.dtype)
+        self.file.write(array.tobytes())
+        self.rows += len(array)
+
+    def close(self):
+        if self.file is None:
+            np.save(self.path, np.zeros(0))
+            return
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self.file.write(_npy_header(self.dtype, (self.rows,) + self.tail))
+        self.file.close()
+
+
+class StoreWriter:
+    """Writes a store (see save) chunk by chunk
+
+    Columns and arrays are appended to their .npy files as chunks arrive, so
+    memory depends on the chunk size and the distinct strings, not the row
+    count. String columns share one dictionary across chunks; categorical columns get their
+    categories sorted on finish, as read_csv orders them. finish() renames the
+    store into place; leaving the with block on an error discards it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        self.tmp = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+        self.rows = 0
+        self.columns = []
+        self.arrays = []
+        self._files = {}
+        self._encoders = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+    def _entry(self, entries, prefix, name):
+        """(manifest entry, _ArrayFile) of a column or array, created on first use"""
+        if (prefix, name) not in self._files:
+            entry = {'name': name, 'file': f'{prefix}_{len(entries)}.npy'}
+            entries.append(entry)
+            self._files[prefix, name] = entry, _ArrayFile(os.path.join(self.tmp, entry['file']), name)
+        return self._files[prefix, name]
+
+    def append(self, frame, arrays=None):
+        """Append a chunk of rows (frame columns plus row-aligned arrays)"""
+        for col in frame.columns:
+            values = frame[col]
+            entry, array_file = self._entry(self.columns, 'col', col)
+            if 'kind' not in entry:
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    entry['kind'] = 'category'
+                elif pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                    entry['kind'] = 'numeric'
+                else:
+                    entry['kind'] = 'strings'
+                if entry['kind'] != 'numeric':
+                    self._encoders[col] = StringEncoder()
+            if entry['kind'] == 'numeric':
+                array_file.append(values.to_numpy())
+            else:
+                array_file.append(self._encoders[col].encode(values))
+        for name, array in (arrays or {}).items():
+            self._entry(self.arrays, 'arr', name)[1].append(np.asarray(array))
+        self.rows += len(frame)
+
+    def recast(self, col, dtype):
+        """Convert a column's stored values to dtype once every chunk is in (slice by slice)"""
+        array_file = self._files['col', col][1]
+        array_file.close()
+        source = np.load(array_file.path, mmap_mode='r')
+        if source.dtype == dtype:
+            return
+        target = np.lib.format.open_memmap(array_file.path + '.new', mode='w+', dtype=dtype, shape=source.shape)
+        for start in range(0, len(source), REWRITE_ROWS):
+            target[start:start + REWRITE_ROWS] = source[start:start + REWRITE_ROWS]
+        target.flush()
+        del source, target
+        os.replace(array_file.path + '.new', array_file.path)
+
+    def _sort_categories(self, entry, categories):
+        """Categories in sorted order, with the column's codes remapped in place"""
+        order = sorted(range(len(categories)), key=categories.__getitem__)
+        remap = np.full(len(categories) + 1, -1, dtype=np.int32)  # code -1 stays -1
+        remap[order] = np.arange(len(categories), dtype=np.int32)
+        codes = np.load(os.path.join(self.tmp, entry['file']), mmap_mode='r+')
+        for start in range(0, len(codes), REWRITE_ROWS):
+            codes[start:start + REWRITE_ROWS] = remap[codes[start:start + REWRITE_ROWS]]
+        codes.flush()
+        del codes
+        return [categories[i] for i in order]
+
+    def finish(self, meta=None):
+        """Write the manifest and move the store into place"""
+        try:
+            for _, array_file in self._files.values():
+                array_file.close()
+            for entry in self.columns:
+                if entry['kind'] == 'strings':
+                    entry['categories'] = self._encoders[entry['name']].categories
+                elif entry['kind'] == 'category':
+                    entry['categories'] = self._sort_categories(entry, self._encoders[entry['name']].categories)
+                if entry['kind'] != 'numeric':
+                    self.recast(entry['name'], code_dtype(entry['categories']))
+
+            manifest = {'rows': self.rows, 'columns': self.columns, 'arrays': self.arrays, 'meta': meta or {}}
+            with open(os.path.join(self.tmp, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            _move_into_place(self.tmp, self.directory)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        for _, array_file in self._files.values():
+            if array_file.file is not None:
+                array_file.file.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def prune(parent, prefix, keep):
+    """Delete stores named prefix* under parent except the ones listed in keep"""
+    if not os.path.isdir(parent):
+        return
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if name.startswith(prefix) and name not in keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
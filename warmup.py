@@ -0,0 +1,92 @@
+"""Warm-up after a tracker release: build everything before the first request
+
+Run once after a new CSV is deployed:
+
+    python warmup.py [china_investment_tracker.csv] [--workers N] [--stages stats estimate ...]
+
+This brings the classified store, index, cube, rollup and sketches on disk up
+to date (see ingest.py), so new processes map them instead of parsing and
+classifying. Then it loads a QueryEngine, computes the default view once and
+reports each stage's time. Those results go when it exits.
+
+Result caches live in each process, so each process warms its own default
+view: every target industry plus the top DEFAULT_OTHER_SECTORS other sectors,
+all years, default amount range. api.py runs warm() before serving. The
+Streamlit app runs start() (a background thread) once its engine is loaded.
+A rerun that needs a result the thread is still computing waits for it
+(LRUCache.get_or_compute) rather than computing it again. Set WARMUP=0 to
+skip it. The sketches for the approximate overview are only loaded when
+APPROX_METRICS=1 turns that overview on.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+from classifier import DATA_FILE
+from engine import QueryEngine
+from ingest import ingest
+
+WARMUP = os.environ.get('WARMUP', '1') != '0'
+# Same switch as the app's approximate overview
+APPROX_METRICS = os.environ.get('APPROX_METRICS') == '1'
+
+# QueryEngine results that can be warmed per filter key
+STAGES = ['estimate', 'stats', 'concentration', 'selection', 'periods']
+# The ones the default view uses, in the order a first page view needs them (month / quarter
+# trends are opt-in, and so is the approximate overview)
+DEFAULT_STAGES = (['estimate'] if APPROX_METRICS else []) + ['stats', 'concentration', 'selection']
+
+logger = logging.getLogger('dashboard.warmup')
+
+
+def warm(engine, keys=None, stages=None):
+    """Compute (and cache) stages (default DEFAULT_STAGES) for each filter key, default view if none
+
+    Returns {stage: seconds}.
+    """
+    stages = DEFAULT_STAGES if stages is None else stages
+    timings = dict.fromkeys(stages, 0.0)
+    for key in keys or [engine.key()]:
+        for name in stages:
+            started = time.perf_counter()
+            getattr(engine, name)(key)
+            timings[name] += time.perf_counter() - started
+    return timings
+
+
+def start(engine, keys=None, stages=None, then=None):
+    """warm() in a daemon thread, followed by then() (e.g. prebuilding charts); returns the thread"""
+    def run():
+        try:
+            timings = warm(engine, keys, stages)
+            if then is not None:
+                then()
+        except Exception:
+            logger.exception('warm-up failed')
+            return
+        logger.info('warm-up of store %s done in %.3fs', engine.version, sum(timings.values()))
+
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the store, index, cube and default results for a tracker CSV')
+    parser.add_argument('csv', nargs='?', default=DATA_FILE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='classification processes (default CLASSIFY_WORKERS; 0 = one per core)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=DEFAULT_STAGES,
+                        help=f"results to compute (default: {' '.join(DEFAULT_STAGES)})")
+    args = parser.parse_args()
+
+    dataset, report = ingest(args.csv, args.workers)
+    print(f"✅ store {report['mode']}: {report['rows']:,} rows in {report['seconds']:.2f}s → {dataset.directory}")
+
+    started = time.perf_counter()
+    engine = QueryEngine(dataset)
+    print(f"✅ index and cube ready in {time.perf_counter() - started:.2f}s")
+    for name, seconds in warm(engine, stages=args.stages).items():
+        print(f"  {name:<14} {seconds:.4f}s")